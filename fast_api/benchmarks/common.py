@@ -0,0 +1,203 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against the real application, either in-process through
+httpx's ASGI transport or against a live server passed with ``--url``.
+The database is chosen with ``--database-url`` and has to be configured
+before anything under ``src`` is imported, because the engine is built
+at import time. Login and token refresh need Redis (the session store);
+in-process runs fall back to fakeredis when no Redis server answers, so
+a plain SQLite checkout works without one (``--redis``).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///./bench.db"
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench123"
+
+SYNC_DRIVERS = {
+    "sqlite+aiosqlite": "sqlite",
+    "postgresql+asyncpg": "postgresql+psycopg2",
+}
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--url", default=None, help="Base URL of a running server; in-process when omitted")
+    parser.add_argument("--contacts", type=int, default=1000, help="Contacts seeded for the benchmark user")
+    parser.add_argument("--requests", type=int, default=500, help="Requests sent per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument(
+        "--redis", choices=["auto", "server", "fake"], default="auto",
+        help="Redis for in-process runs: the configured server, fakeredis, or the server if it answers (auto)",
+    )
+    return parser
+
+
+def configure(database_url: str, rate_limit: bool = False, redis: str = "auto") -> None:
+    """
+    Point the app at the benchmark database. Rate limiting is off unless asked
+    for, otherwise the default limit would reject most of the load. Settings
+    are read here, so set any other environment variables before calling it.
+    """
+    os.environ["SQLALCHEMY_DATABASE_URL"] = database_url
+    os.environ["RATE_LIMIT_ENABLED"] = str(rate_limit).lower()
+    if redis == "fake" or (redis == "auto" and not redis_reachable()):
+        import fakeredis
+
+        from src.database.redis import set_redis
+
+        print("Using fakeredis: no Redis server", file=sys.stderr)
+        set_redis(fakeredis.FakeAsyncRedis())
+
+
+def redis_reachable() -> bool:
+    import redis
+    from redis.exceptions import RedisError
+
+    from src.conf.config import settings
+
+    client = redis.Redis(host=settings.redis_host, port=settings.redis_port, socket_connect_timeout=0.5)
+    try:
+        return client.ping()
+    except (RedisError, OSError):
+        return False
+    finally:
+        client.close()
+
+
+def sync_url(url: str) -> str:
+    from sqlalchemy.engine import make_url
+
+    parsed = make_url(url)
+    return parsed.set(drivername=SYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+async def seed(contacts: int, other_users: int = 0) -> None:
+    """
+    Recreate the schema and insert one confirmed user owning ``contacts`` rows.
+    ``other_users`` more users get as many contacts each, so per-user queries
+    run against a table shared by many address books.
+    """
+    from sqlalchemy import insert, text
+
+    from src.database.db import engine
+    from src.database.models import Base, Contact, User
+    from src.services.auth import auth_service
+
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        password = auth_service.get_password_hash(BENCH_PASSWORD)
+        for n in range(other_users + 1):
+            result = await conn.execute(
+                insert(User).returning(User.id),
+                [{
+                    "username": "bench",
+                    "email": BENCH_EMAIL if n == 0 else f"other{n}@example.com",
+                    "password": password,
+                    "confirmed": True,
+                }],
+            )
+            user_id = result.scalar_one()
+            rows = [
+                {
+                    "first_name": f"First{i}",
+                    "last_name": f"Last{i % 997}",
+                    "email": f"contact{i}@example.com",
+                    "phone_number": f"+380{i:09d}",
+                    "birth_date": date(1980, 1, 1) + timedelta(days=i % 10000),
+                    "user_id": user_id,
+                }
+                for i in range(contacts)
+            ]
+            for start in range(0, len(rows), 1000):
+                await conn.execute(insert(Contact), rows[start:start + 1000])
+
+
+def make_client(url: str | None):
+    import httpx
+
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+    from main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+
+async def login(client) -> dict:
+    response = await client.post("/api/auth/login", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@dataclass
+class Result:
+    name: str
+    concurrency: int
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "rps": round(len(self.latencies) / self.elapsed, 1) if self.elapsed else 0.0,
+            "mean_ms": round(statistics.fmean(self.latencies) * 1000, 2) if self.latencies else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+        }
+
+
+async def run_load(name: str, send, concurrency: int, total: int) -> Result:
+    """
+    Call ``send()`` ``total`` times with at most ``concurrency`` requests in flight.
+
+    ``send`` is a coroutine function returning an httpx response.
+    """
+    result = Result(name=name, concurrency=concurrency)
+    queue = iter(range(total))
+
+    async def worker():
+        for _ in queue:
+            start = time.perf_counter()
+            response = await send()
+            result.latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                result.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def print_table(results: list) -> None:
+    columns = ["name", "concurrency", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"]
+    print(" | ".join(f"{c:>12}" for c in columns))
+    for result in results:
+        row = result.summary()
+        print(" | ".join(f"{str(row[c]):>12}" for c in columns))
@@ -0,0 +1,82 @@
+"""
+Row hydration benchmark: ORM Contact entities versus read-only column rows.
+
+Loads the same contacts both ways and reports CPU time and memory (peak
+during the fetch and retained by the result list, from tracemalloc), scaled
+to 10k rows. Serialization is left out; see benchmarks.serialization.
+
+    python -m benchmarks.hydration --rows 10000
+"""
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+
+from benchmarks import common
+
+PER = 10_000
+
+
+async def measure(statement, orm: bool) -> tuple:
+    """
+    CPU time comes from a plain pass; memory from a second pass under tracemalloc,
+    which would otherwise inflate the CPU figure.
+    """
+    from src.database.db import DBSession
+
+    async with DBSession() as db:
+        gc.collect()
+        start = time.process_time()
+        result = await db.execute(statement)
+        rows = result.scalars().all() if orm else result.all()
+        cpu = time.process_time() - start
+        count = len(rows)
+        del rows, result
+    async with DBSession() as db:
+        gc.collect()
+        tracemalloc.start()
+        result = await db.execute(statement)
+        rows = result.scalars().all() if orm else result.all()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del rows, result
+    return cpu, peak, retained, count
+
+
+async def main(args) -> None:
+    await common.seed(args.rows)
+
+    from sqlalchemy import select
+
+    from src.database.db import engine
+    from src.database.models import Contact
+    from src.repository.contacts import RESPONSE_COLUMNS
+
+    variants = {
+        "orm": (select(Contact).order_by(Contact.id), True),
+        "rows": (select(*RESPONSE_COLUMNS).order_by(Contact.id), False),
+    }
+    # One untimed pass each, so both runs hit a warm page cache and compiled statements.
+    for statement, orm in variants.values():
+        await measure(statement, orm)
+
+    print(" | ".join(f"{c:>16}" for c in ["variant", "rows", "cpu_ms/10k", "peak_kib/10k", "retained_kib/10k"]))
+    for name, (statement, orm) in variants.items():
+        samples = [await measure(statement, orm) for _ in range(args.repeat)]
+        count = samples[0][3]
+        scale = PER / count
+        cpu = statistics.median(s[0] for s in samples) * 1000 * scale
+        peak = statistics.median(s[1] for s in samples) / 1024 * scale
+        retained = statistics.median(s[2] for s in samples) / 1024 * scale
+        print(" | ".join(f"{str(v):>16}" for v in [name, count, round(cpu, 1), round(peak), round(retained)]))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = common.base_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=PER)
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+    common.configure(arguments.database_url, redis=arguments.redis)
+    asyncio.run(main(arguments))
@@ -0,0 +1,44 @@
+"""
+Per-request overhead of the rate limiter on ``GET /api/contacts/``.
+
+Runs the same load with the limiter disabled and enabled. The limit is set
+high enough that nothing is rejected, so the difference is the cost of the
+key function and the storage round trip.
+
+    python -m benchmarks.limiter_overhead --storage-uri memory://
+    python -m benchmarks.limiter_overhead --storage-uri redis://localhost:6379
+"""
+import asyncio
+import os
+
+from benchmarks import common
+
+
+async def main(args) -> None:
+    await common.seed(args.contacts)
+
+    from src.services.limiter import limiter
+
+    results = []
+    async with common.make_client(args.url) as client:
+        headers = await common.login(client)
+        for enabled in (False, True):
+            limiter.enabled = enabled
+            limiter.reset()
+            for concurrency in args.concurrency:
+                results.append(await common.run_load(
+                    "limiter" if enabled else "no limiter",
+                    lambda: client.get("/api/contacts/", params={"limit": 10}, headers=headers),
+                    concurrency, args.requests,
+                ))
+    common.print_table(results)
+
+
+if __name__ == "__main__":
+    parser = common.base_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--storage-uri", default="memory://")
+    arguments = parser.parse_args()
+    os.environ["RATE_LIMIT_STORAGE_URI"] = arguments.storage_uri
+    os.environ["RATE_LIMIT_DEFAULT"] = "1000000/minute"
+    common.configure(arguments.database_url, rate_limit=True, redis=arguments.redis)
+    asyncio.run(main(arguments))
@@ -0,0 +1,55 @@
+"""
+Latency of ``GET /api/contacts/`` while logins run concurrently.
+
+Each bcrypt verification costs 100-300 ms of CPU. With ``inline`` hashing
+it runs on the event loop and every other request waits behind it; with
+``pool`` it runs on the bounded password-hash executor.
+
+    python -m benchmarks.login_latency --logins 40 --requests 400
+"""
+import asyncio
+
+from benchmarks import common
+
+
+async def inline_verify_password(plain_password, hashed_password):
+    from src.services.auth import auth_service
+
+    return auth_service.verify_password(plain_password, hashed_password)
+
+
+async def main(args) -> None:
+    await common.seed(args.contacts)
+
+    from src.services.auth import auth_service
+
+    variants = {"pool": auth_service.verify_password_async, "inline": inline_verify_password}
+    login_form = {"username": common.BENCH_EMAIL, "password": common.BENCH_PASSWORD}
+    results = []
+    async with common.make_client(args.url) as client:
+        headers = await common.login(client)
+        for name, verify_password in variants.items():
+            auth_service.verify_password_async = verify_password
+            for concurrency in args.concurrency:
+                logins, contacts = await asyncio.gather(
+                    common.run_load(
+                        f"{name}/login", lambda: client.post("/api/auth/login", data=login_form),
+                        args.login_concurrency, args.logins,
+                    ),
+                    common.run_load(
+                        f"{name}/contacts", lambda: client.get("/api/contacts/", headers=headers),
+                        concurrency, args.requests,
+                    ),
+                )
+                results.extend([logins, contacts])
+        del auth_service.verify_password_async
+    common.print_table(results)
+
+
+if __name__ == "__main__":
+    parser = common.base_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=40, help="Logins sent per run")
+    parser.add_argument("--login-concurrency", type=int, default=4)
+    arguments = parser.parse_args()
+    common.configure(arguments.database_url, redis=arguments.redis)
+    asyncio.run(main(arguments))
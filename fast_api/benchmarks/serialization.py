@@ -0,0 +1,78 @@
+"""
+Serialization benchmark for the contact list and search responses.
+
+Compares the previous path (ORM objects validated through
+``response_model=List[ContactResponse]`` and encoded with the stdlib json,
+as FastAPI does) with the fast path (column rows turned into dicts and
+encoded with orjson), at several result sizes. Query and encoding time are
+reported separately.
+
+    python -m benchmarks.serialization --sizes 1000 10000 100000
+"""
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+from benchmarks import common
+
+
+def median_time(samples: list) -> float:
+    return round(statistics.median(samples) * 1000, 2)
+
+
+async def main(args) -> None:
+    await common.seed(max(args.sizes))
+
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+
+    from src.database.db import DBSession, engine
+    from src.database.models import Contact
+    from src.repository.contacts import RESPONSE_COLUMNS, RESPONSE_FIELDS
+    from src.schemas import ContactResponse
+    from src.services.export import json_response, row_dicts
+
+    adapter = TypeAdapter(List[ContactResponse])
+
+    def encode_orm(contacts) -> bytes:
+        # What serialize_response plus JSONResponse do for response_model routes.
+        value = adapter.validate_python(contacts, from_attributes=True)
+        content = adapter.dump_python(value, mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def encode_rows(rows) -> bytes:
+        return json_response(row_dicts(rows, RESPONSE_FIELDS)).body
+
+    variants = {
+        "orm+pydantic+json": (lambda n: select(Contact).order_by(Contact.id).limit(n), True, encode_orm),
+        "rows+orjson": (lambda n: select(*RESPONSE_COLUMNS).order_by(Contact.id).limit(n), False, encode_rows),
+    }
+    print(" | ".join(f"{c:>18}" for c in ["variant", "rows", "query_ms", "encode_ms", "total_ms", "bytes"]))
+    for size in args.sizes:
+        for name, (statement, orm, encode) in variants.items():
+            query_times, encode_times, body = [], [], b""
+            for _ in range(args.repeat):
+                async with DBSession() as db:
+                    start = time.perf_counter()
+                    result = await db.execute(statement(size))
+                    rows = result.scalars().all() if orm else result.all()
+                    query_times.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    body = encode(rows)
+                    encode_times.append(time.perf_counter() - start)
+            query_ms, encode_ms = median_time(query_times), median_time(encode_times)
+            print(" | ".join(f"{str(v):>18}" for v in [
+                name, size, query_ms, encode_ms, round(query_ms + encode_ms, 2), len(body)
+            ]))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = common.base_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+    common.configure(arguments.database_url, redis=arguments.redis)
+    asyncio.run(main(arguments))
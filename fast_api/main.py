@@ -1,26 +1,44 @@
 import time
 from ipaddress import ip_address
 
-from fastapi import FastAPI, Depends, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from starlette.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from starlette.routing import Match
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+from slowapi.middleware import SlowAPIMiddleware
 
 from src.database.db import get_db
-from src.database.models import Contact
+from src.database.models import User
+from src.database.pool import pool_stats
+from src.services.limiter import limiter
+from src.conf.config import settings
+from src.repository import contacts as repository_contacts
+from src.services.auth import auth_service
+from src.services.page_cache import features_cache
+from src.services.metrics import RATE_LIMIT_REJECTIONS, UNMATCHED, MetricsMiddleware, metrics_response, track_task
 
 from src.routes import contacts, auth, users
+from src.services.query_guard import QueryGuardMiddleware, query_budget
 
-limiter = Limiter(key_func=get_remote_address)
 app = FastAPI()
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+
+def rate_limit_exceeded(request: Request, exc: RateLimitExceeded):
+    # Default limits are checked before routing, so find the route template here.
+    route = next((r.path for r in app.router.routes if r.matches(request.scope)[0] == Match.FULL), UNMATCHED)
+    RATE_LIMIT_REJECTIONS.labels(route).inc()
+    return _rate_limit_exceeded_handler(request, exc)
+
+
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded)
+app.add_middleware(SlowAPIMiddleware)
 
 
 app.add_middleware(
@@ -41,6 +59,13 @@ async def custom_middleware(request: Request, call_next):
     return response
 
 
+if settings.query_guard_enabled:
+    app.add_middleware(QueryGuardMiddleware)
+if settings.metrics_enabled:
+    # Added last, so it is the outermost middleware and times the whole stack.
+    app.add_middleware(MetricsMiddleware)
+
+
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -55,19 +80,48 @@ async def root(request: Request):
 
 @app.get("/features", response_class=HTMLResponse, description="Features Page")
 @limiter.limit("5/minute")
-async def features(request: Request, db: Session = Depends(get_db)):
-    contacts_data = db.query(Contact).all()
-
-    return templates.TemplateResponse(
-        "features.html", {"request": request, "title": "Features", "features_data": contacts_data}
+@query_budget(1)
+async def features(request: Request, after: int = Query(0, ge=0), db: AsyncSession = Depends(get_db)):
+    """
+    The features function renders one page of contact names, continuing after the id ``after``.
+        Pages come from features_cache when possible. Otherwise the page is streamed
+        while it renders and stored in the cache once complete; contact writes
+        invalidate the cache.
+
+    :param request: Request: The incoming request, passed to the template
+    :param after: int: The last id of the previous page
+    :param db: AsyncSession: Read the page when it is not cached
+    :return: An HTML page
+    """
+    key = str(after)
+    html = await features_cache.get(key)
+    if html is not None:
+        return HTMLResponse(html)
+
+    limit = settings.features_page_size
+    rows = await repository_contacts.get_contact_names(db, after, limit + 1)
+    next_after = rows[limit - 1].id if len(rows) > limit else None
+    chunks = templates.get_template("features.html").generate(
+        {"request": request, "title": "Features", "features_data": rows[:limit], "next_after": next_after}
     )
 
+    async def render():
+        rendered = []
+        for chunk in chunks:
+            rendered.append(chunk)
+            yield chunk
+        async with track_task("features_cache_fill"):
+            await features_cache.set(key, "".join(rendered))
+
+    return StreamingResponse(render(), media_type="text/html")
+
 
 @app.get("/api/healthchecker")
-def healthchecker(db: Session = Depends(get_db)):
+@query_budget(1)
+async def healthchecker(db: AsyncSession = Depends(get_db)):
     try:
         # Make request
-        result = db.execute(text("SELECT 1")).fetchone()
+        result = (await db.execute(text("SELECT 1"))).fetchone()
         if result is None:
             raise HTTPException(
                 status_code=500, detail="Database is not configured correctly"
@@ -78,6 +132,31 @@ def healthchecker(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Error connecting to the database")
 
 
+@app.get("/api/healthchecker/pool")
+async def pool_healthchecker(current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The pool_healthchecker function reports the connection pool state of this worker.
+        Used to size db_pool_size and db_max_overflow per worker. Requires a signed-in user,
+        since it exposes pool internals.
+
+    :param current_user: User: The authenticated user
+    :return: Pool size, checked-out and overflow connections and a checkout wait histogram
+    """
+    return pool_stats.snapshot()
+
+
+@app.get("/metrics", include_in_schema=False)
+@limiter.exempt
+async def metrics(request: Request):
+    """
+    The metrics function exposes request, SQL, pool, background task and rate limiter metrics to Prometheus.
+
+    :param request: Request: The scrape request
+    :return: Metrics in the Prometheus text format
+    """
+    return metrics_response(request)
+
+
 app.include_router(contacts.router, prefix="/api")
 app.include_router(auth.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
@@ -0,0 +1,26 @@
+"""add users token_version
+
+Revision ID: 5bb93eb1cae4
+Revises: d67aaf9892d8
+Create Date: 2026-10-18 20:03:11.902716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5bb93eb1cae4'
+down_revision: Union[str, None] = 'd67aaf9892d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,29 @@
+"""backfill users confirmed
+
+Revision ID: 7c1d0e5a9b32
+Revises: 5bb93eb1cae4
+Create Date: 2026-10-18 23:12:47.306518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d0e5a9b32'
+down_revision: Union[str, None] = '5bb93eb1cae4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 15cedf8546f1 added confirmed as nullable with no default, so users
+    # created before it hold NULL: treat them as not confirmed yet.
+    op.execute('UPDATE users SET confirmed = false WHERE confirmed IS NULL')
+    op.alter_column('users', 'confirmed', server_default=sa.false())
+
+
+def downgrade() -> None:
+    op.alter_column('users', 'confirmed', server_default=None)
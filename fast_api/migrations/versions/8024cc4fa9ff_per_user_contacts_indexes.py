@@ -0,0 +1,51 @@
+"""per-user contacts indexes
+
+Revision ID: 8024cc4fa9ff
+Revises: b590ce88f85d
+Create Date: 2026-10-18 15:03:38.208114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8024cc4fa9ff'
+down_revision: Union[str, None] = 'b590ce88f85d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Every contacts query filters on user_id first; the single-column indexes
+# below made Postgres intersect bitmaps or filter after the lookup.
+# (user_id, email) unique already exists as uq_contacts_user_id_email, and
+# (user_id, last_name, id) as ix_contacts_user_id_last_name_id for the list order.
+NEW_INDEXES = {
+    'ix_contacts_user_id_id': ['user_id', 'id'],
+}
+OLD_INDEXES = {
+    'ix_contacts_email': (['email'], True),
+    'ix_contacts_first_name': (['first_name'], False),
+    'ix_contacts_id': (['id'], False),
+    'ix_contacts_last_name': (['last_name'], False),
+    'ix_contacts_phone_number': (['phone_number'], False),
+}
+
+
+def upgrade() -> None:
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block,
+    # and does not take a lock that blocks writes on contacts.
+    with op.get_context().autocommit_block():
+        for name, columns in NEW_INDEXES.items():
+            op.create_index(name, 'contacts', columns, unique=False, postgresql_concurrently=True)
+        for name in OLD_INDEXES:
+            op.drop_index(name, table_name='contacts', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, (columns, unique) in OLD_INDEXES.items():
+            op.create_index(name, 'contacts', columns, unique=unique, postgresql_concurrently=True)
+        for name in NEW_INDEXES:
+            op.drop_index(name, table_name='contacts', postgresql_concurrently=True)
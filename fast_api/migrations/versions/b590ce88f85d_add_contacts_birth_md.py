@@ -0,0 +1,42 @@
+"""add contacts birth_md
+
+Revision ID: b590ce88f85d
+Revises: b9c6ba795584
+Create Date: 2026-10-18 14:22:10.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b590ce88f85d'
+down_revision: Union[str, None] = 'b9c6ba795584'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Adding a stored generated column rewrites contacts under an ACCESS EXCLUSIVE
+    # lock, so reads and writes wait for the whole rewrite. Run it in a quiet window.
+    op.add_column('contacts', sa.Column(
+        'birth_md', sa.Integer(),
+        sa.Computed('CAST(EXTRACT(month FROM birth_date) * 100 + EXTRACT(day FROM birth_date) AS INTEGER)', persisted=True),
+    ))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_contacts_user_id_birth_md', 'contacts', ['user_id', 'birth_md'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_contacts_user_id_birth_md', table_name='contacts', postgresql_concurrently=True)
+    op.drop_column('contacts', 'birth_md')
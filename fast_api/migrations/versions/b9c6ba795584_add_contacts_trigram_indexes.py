@@ -0,0 +1,44 @@
+"""add contacts trigram indexes
+
+Revision ID: b9c6ba795584
+Revises: feeab3101007
+Create Date: 2026-10-18 13:05:47.903815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9c6ba795584'
+down_revision: Union[str, None] = 'feeab3101007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXES = {
+    'ix_contacts_first_name_trgm': 'lower(first_name)',
+    'ix_contacts_last_name_trgm': 'lower(last_name)',
+    'ix_contacts_email_trgm': 'lower(email)',
+    'ix_contacts_phone_number_trgm': 'phone_number',
+}
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, expression in TRIGRAM_INDEXES.items():
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON contacts USING gin ({expression} gin_trgm_ops)'
+            )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        for name in TRIGRAM_INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,26 @@
+"""add contacts keyset index
+
+Revision ID: ce57882da815
+Revises: 15cedf8546f1
+Create Date: 2026-10-18 10:12:31.482210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ce57882da815'
+down_revision: Union[str, None] = '15cedf8546f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_contacts_user_id_last_name_id', 'contacts', ['user_id', 'last_name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_last_name_id', table_name='contacts')
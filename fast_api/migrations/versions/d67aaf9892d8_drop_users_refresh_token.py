@@ -0,0 +1,27 @@
+"""drop users refresh_token
+
+Revision ID: d67aaf9892d8
+Revises: f940f4706f25
+Create Date: 2026-10-18 19:12:40.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd67aaf9892d8'
+down_revision: Union[str, None] = 'f940f4706f25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Refresh tokens live in the Redis session store (src/services/sessions.py).
+    op.drop_column('users', 'refresh_token')
+
+
+def downgrade() -> None:
+    op.add_column('users', sa.Column('refresh_token', sa.String(length=255), nullable=True))
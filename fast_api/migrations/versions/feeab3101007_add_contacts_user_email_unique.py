@@ -0,0 +1,33 @@
+"""add contacts (user_id, email) unique index
+
+Revision ID: feeab3101007
+Revises: ce57882da815
+Create Date: 2026-10-18 11:40:05.117342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'feeab3101007'
+down_revision: Union[str, None] = 'ce57882da815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Conflict target of the bulk import's INSERT ... ON CONFLICT (user_id, email).
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_contacts_user_id_email', 'contacts', ['user_id', 'email'],
+            unique=True, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('uq_contacts_user_id_email', table_name='contacts', postgresql_concurrently=True)
@@ -1,25 +1,63 @@
 from fastapi import HTTPException, status
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.exc import SQLAlchemyError
 
 from src.conf.config import settings
+from src.database.pool import InstrumentedPool, install_slow_query_log, pool_stats
+from src.services.metrics import install_query_metrics
+from src.services.query_guard import install_query_guard
 
 
 
 URI = settings.sqlalchemy_database_url
 
-engine = create_engine(URI, echo=True)
-DBSession = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+def engine_options(uri: str) -> dict:
+    """
+    The engine_options function builds the create_async_engine keyword arguments from settings.
+        In-memory SQLite keeps SQLAlchemy's single-connection pool, since a sized
+        queue pool would give every checkout its own empty database.
+
+    :param uri: str: The database URL the engine is created for
+    :return: Keyword arguments for create_async_engine
+    """
+    options = {"echo": settings.db_echo, "pool_pre_ping": settings.db_pool_pre_ping}
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=InstrumentedPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    return options
+
+
+engine = create_async_engine(URI, **engine_options(URI))
+pool_stats.pool = engine.sync_engine.pool
+install_slow_query_log(engine.sync_engine, settings.db_slow_query_threshold, settings.db_slow_query_sample_rate)
+if settings.metrics_enabled:
+    install_query_metrics(engine.sync_engine)
+if settings.query_guard_enabled:
+    install_query_guard(engine.sync_engine)
+DBSession = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
 
 
 # Dependency
-def get_db():
-    db = DBSession()
-    try:
-        yield db
-    except SQLAlchemyError as err:
-        db.rollback()
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
-    finally:
-        db.close()
+async def get_db():
+    """
+    The get_db function is a dependency that yields an AsyncSession for the request.
+        Sessions do not expire on commit, so returned ORM objects stay readable
+        without an extra round trip from inside the serializer.
+
+    :return: An AsyncSession bound to the application engine
+    """
+    async with DBSession() as db:
+        try:
+            yield db
+        except SQLAlchemyError as err:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
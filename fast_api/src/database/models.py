@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Date, Column, Integer, String, DateTime, func, ForeignKey
+from sqlalchemy import Boolean, Date, Column, Integer, String, DateTime, func, ForeignKey, Index, Computed, cast, extract, false
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -6,13 +6,25 @@ Base = declarative_base()
 
 class Contact(Base):
     __tablename__ = "contacts"
+    __table_args__ = (
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_id_last_name_id", "user_id", "last_name", "id"),
+        Index("uq_contacts_user_id_email", "user_id", "email", unique=True),
+        Index("ix_contacts_user_id_birth_md", "user_id", "birth_md"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True, server_default='1')
-    first_name = Column(String, index=True)
-    last_name = Column(String, index=True)
-    email = Column(String, unique=True, index=True)
-    phone_number = Column(String, index=True)
+    id = Column(Integer, primary_key=True, server_default='1')
+    first_name = Column(String)
+    last_name = Column(String)
+    email = Column(String)
+    phone_number = Column(String)
     birth_date = Column(Date)
+    # Year-agnostic birthday key, MMDD as an integer (e.g. 1231). Generated by the
+    # database, so every writer (ORM, bulk INSERT, UPDATE) keeps it in sync.
+    birth_md = Column(
+        Integer,
+        Computed(cast(extract("month", birth_date) * 100 + extract("day", birth_date), Integer), persisted=True),
+    )
     additional_data = Column(String, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -21,6 +33,25 @@ class Contact(Base):
     
     def is_owner(self, user_id):
         return self.user_id == user_id
+
+
+def _trigram_index(name, expression):
+    """
+    GIN trigram index (pg_trgm, Postgres only) behind the contacts search. It serves
+    both the similarity operator and the case-insensitive prefix LIKE on ``expression``.
+    """
+    return Index(
+        f"ix_contacts_{name}_trgm",
+        expression.label(name),
+        postgresql_using="gin",
+        postgresql_ops={name: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+
+
+_trigram_index("first_name", func.lower(Contact.first_name))
+_trigram_index("last_name", func.lower(Contact.last_name))
+_trigram_index("email", func.lower(Contact.email))
+_trigram_index("phone_number", Contact.phone_number)
     
     
 class User(Base):
@@ -29,6 +60,25 @@ class User(Base):
     username = Column(String(50))
     email = Column(String(150), nullable=False, unique=True)
     password = Column(String(255), nullable=False)
-    refresh_token = Column(String(255), nullable=True)
     avatar = Column(String(255), nullable=True)
-    confirmed = Column(Boolean, default=False)
+    confirmed = Column(Boolean, default=False, server_default=false())
+    # Bumped to revoke every access token issued so far (the ``ver`` claim).
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String(150), nullable=False)
+    username = Column(String(50))
+    host = Column(String(255), nullable=False)
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=func.now())
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
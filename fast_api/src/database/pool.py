@@ -0,0 +1,93 @@
+import logging
+import random
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolStats:
+    """
+    Checkout wait times for the engine pool, kept as a cumulative-friendly histogram.
+    """
+
+    def __init__(self, buckets: tuple = WAIT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.pool = None
+
+    def observe_wait(self, seconds: float) -> None:
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+
+    def snapshot(self) -> dict:
+        """
+        The snapshot function returns the current pool state and the checkout wait histogram.
+
+        :return: A dict with pool sizing, checked-out and overflow counts and wait times
+        """
+        pool = self.pool
+        return {
+            "size": pool.size() if pool is not None else 0,
+            "checked_out": pool.checkedout() if pool is not None else 0,
+            "checked_in": pool.checkedin() if pool is not None else 0,
+            "overflow": pool.overflow() if pool is not None else 0,
+            "wait_seconds": {
+                "count": sum(self.counts),
+                "sum": round(self.total, 6),
+                "buckets": {
+                    **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                    "+Inf": self.counts[-1],
+                },
+            },
+        }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records how long each checkout waited for a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.observe_wait(time.perf_counter() - start)
+
+
+def install_slow_query_log(engine: Engine, threshold: float, sample_rate: float) -> None:
+    """
+    The install_slow_query_log function logs statements slower than ``threshold`` seconds.
+        Only ``sample_rate`` of the slow statements are written, so a burst of slow
+        queries does not turn into a burst of log lines.
+
+    :param engine: Engine: The sync engine (``AsyncEngine.sync_engine``) to hook
+    :param threshold: float: Duration in seconds above which a statement is slow
+    :param sample_rate: float: Share of slow statements that get logged, from 0 to 1
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start_time"].pop()
+        if duration >= threshold and random.random() < sample_rate:
+            logger.warning("Slow query (%.3fs): %s", duration, statement)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_start_time"):
+            context.connection.info["query_start_time"].pop()
@@ -0,0 +1,39 @@
+import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
+
+from src.conf.config import settings
+
+_client: redis.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    The get_redis function returns the shared Redis client, creating it on first use.
+        Creating the client does not connect; connections are opened lazily by the pool.
+        Commands are not retried: every caller treats Redis as optional and falls back,
+        so failing fast beats the client's default backoff of several seconds.
+
+    :return: The process-wide Redis client
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=0,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+            retry=Retry(NoBackoff(), 0),
+        )
+    return _client
+
+
+def set_redis(client: redis.Redis | None) -> None:
+    """
+    The set_redis function replaces the shared client, e.g. with fakeredis in tests.
+
+    :param client: redis.Redis | None: The client to use, or None to rebuild it from settings
+    """
+    global _client
+    _client = client
@@ -1,114 +1,436 @@
 from datetime import date
 
-from sqlalchemy.orm import Session
+from sqlalchemy import ARRAY, Integer, any_, bindparam, case, delete, func, or_, select, tuple_, update as sql_update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import Contact, User
-from src.schemas import ContactBase
+from src.schemas import ContactBase, ContactChanges, ContactFilter, ContactSelection
+from src.services.contacts_version import contacts_changed
 
 
-async def get_contacts(db: Session, user: User):
+RESPONSE_FIELDS = (
+    "id", "first_name", "last_name", "email", "phone_number", "birth_date",
+    "additional_data", "created_at", "updated_at", "user_id",
+)
+# Read-only queries select these columns instead of Contact. They return Row tuples
+# (``__slots__`` based, attribute access by field name) and skip ORM identity-map
+# bookkeeping and instance state for rows that are only serialized.
+RESPONSE_COLUMNS = tuple(getattr(Contact, field) for field in RESPONSE_FIELDS)
+
+
+async def get_contacts(db: AsyncSession, user: User, limit: int | None = None, after: tuple | None = None):
     """
     The get_contacts function returns a list of contacts for the user.
-        
+        Contacts are ordered by (last_name, id) so the list can be paged with a keyset:
+        pass the (last_name, id) of the last row seen as ``after`` to get the next page.
     
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :param user: User: Get the user_id of the current user
-    :return: A list of contacts
+    :param limit: int | None: Maximum number of contacts to return
+    :param after: tuple | None: The (last_name, id) key to continue after
+    :return: A list of rows, columns as in RESPONSE_FIELDS
     :doc-author: Trelent
     """
-    contacts = db.query(Contact).filter_by(user_id=user.id).all()
-    return contacts
+    stmt = select(*RESPONSE_COLUMNS).filter_by(user_id=user.id).order_by(Contact.last_name, Contact.id)
+    if after is not None:
+        stmt = stmt.filter(tuple_(Contact.last_name, Contact.id) > tuple_(*after))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    contacts = await db.execute(stmt)
+    return contacts.all()
 
 
-async def get_contact_by_id(id: int, user_id: int, db: Session):
-    contact = db.query(Contact).filter_by(id=id, user_id=user_id).first()
-    return contact
+EXPORT_COLUMNS = (
+    "id", "first_name", "last_name", "email", "phone_number",
+    "birth_date", "additional_data", "created_at", "updated_at",
+)
 
 
-async def get_contact_by_email(email: str, user_id: int, db: Session):
-    contact = db.query(Contact).filter_by(email=email, user_id=user_id).first()
-    return contact
+async def stream_contacts(db: AsyncSession, user: User, chunk_size: int = 1000):
+    """
+    The stream_contacts function yields all contacts of the user in chunks of plain rows.
+        Rows come from a server-side cursor (``yield_per``), so only one chunk
+        is held in memory no matter how large the address book is.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the user_id of the current user
+    :param chunk_size: int: Number of rows fetched per round trip
+    :return: An async iterator of row lists, columns as in EXPORT_COLUMNS
+    """
+    stmt = (
+        select(*(getattr(Contact, column) for column in EXPORT_COLUMNS))
+        .filter_by(user_id=user.id)
+        .order_by(Contact.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        yield partition
 
 
-async def create(body: ContactBase, db: Session, user: User):
+async def get_contact_names(db: AsyncSession, after: int, limit: int):
+    """
+    The get_contact_names function returns one page of (id, first_name, last_name) rows
+        of all contacts, ordered by id and continuing after the id ``after``.
+        Only the three columns are read and the page is found through the primary key,
+        so a page costs the same however large the table is.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param after: int: The last id of the previous page, 0 for the first page
+    :param limit: int: Maximum number of rows to return
+    :return: A list of rows
+    """
+    stmt = (
+        select(Contact.id, Contact.first_name, Contact.last_name)
+        .filter(Contact.id > after)
+        .order_by(Contact.id)
+        .limit(limit)
+    )
+    rows = await db.execute(stmt)
+    return rows.all()
+
+
+async def get_contact_by_id(id: int, user_id: int, db: AsyncSession):
+    stmt = select(Contact).filter_by(id=id, user_id=user_id)
+    contact = await db.execute(stmt)
+    return contact.scalars().first()
+
+
+async def get_contact_row(id: int, user_id: int, db: AsyncSession):
+    """
+    The get_contact_row function is the read-only twin of get_contact_by_id.
+        It returns a plain row, not a tracked Contact, so use it when the contact
+        is only sent back to the client.
+
+    :param id: int: The contact id
+    :param user_id: int: The owner of the contact
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A row with the columns in RESPONSE_FIELDS, or None
+    """
+    stmt = select(*RESPONSE_COLUMNS).filter_by(id=id, user_id=user_id)
+    contact = await db.execute(stmt)
+    return contact.first()
+
+
+async def get_contact_by_email(email: str, user_id: int, db: AsyncSession):
+    stmt = select(Contact).filter_by(email=email, user_id=user_id)
+    contact = await db.execute(stmt)
+    return contact.scalars().first()
+
+
+# Fields a client may set on a new contact; the id and timestamps come from the database.
+CREATE_FIELDS = ("first_name", "last_name", "email", "phone_number", "birth_date", "additional_data")
+# asyncpg binds at most 32767 parameters per statement, and a bulk INSERT binds
+# CREATE_FIELDS plus user_id for every row.
+MAX_BIND_PARAMS = 32767
+MAX_BULK_CHUNK = MAX_BIND_PARAMS // (len(CREATE_FIELDS) + 1)
+
+
+async def create(body: dict, db: AsyncSession, user: User):
     """
     The create function creates a new contact in the database.
-        
+        It is a single INSERT ... ON CONFLICT (user_id, email) DO NOTHING RETURNING,
+        so the duplicate check, the insert and reading back the stored row
+        (ids and timestamps set by the database) cost one round trip.
+        Only CREATE_FIELDS are taken from ``body``.
     
-    :param body: ContactBase: Pass in the data from the request body
-    :param db: Session: Access the database
+    :param body: dict: The contact fields from the request body
+    :param db: AsyncSession: Access the database
     :param user: User: Get the user id of the current logged in user
-    :return: The contact object
+    :return: A row with the columns in RESPONSE_FIELDS, or None if the user already has a contact with this email
     :doc-author: Trelent
     """
-    contact = Contact(**body, user_id=user.id)
-    db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    values = {field: body[field] for field in CREATE_FIELDS if field in body}
+    stmt = _insert_ignoring_duplicates(db).values({**values, "user_id": user.id}).returning(*RESPONSE_COLUMNS)
+    contact = (await db.execute(stmt)).first()
+    await db.commit()
+    if contact is not None:
+        await contacts_changed(user.id)
     return contact
 
 
-async def update(id: int, body: ContactBase, user_id: int, db: Session):
+def _insert_ignoring_duplicates(db: AsyncSession):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(Contact).on_conflict_do_nothing(index_elements=["user_id", "email"])
+
+
+async def bulk_create(rows: list, user_id: int, db: AsyncSession) -> tuple:
+    """
+    The bulk_create function inserts a chunk of validated contacts with one multi-row INSERT.
+        Contacts whose email the user already has are skipped by ON CONFLICT (user_id, email).
+        When the chunk hits any other constraint the rows are retried one at a time,
+        so a single bad row never takes the rest of the chunk down with it.
+        The owner is passed as an id: a rollback expires the ORM objects in the session.
+
+    :param rows: list: Validated contacts as dicts, at most MAX_BULK_CHUNK of them
+    :param user_id: int: The owner of the new contacts
+    :param db: AsyncSession: Access the database
+    :return: A tuple of (inserted count, skipped count, {index in rows: error message})
+    """
+    values = [{**row, "user_id": user_id} for row in rows]
+    try:
+        result = await db.execute(_insert_ignoring_duplicates(db).values(values).returning(Contact.id))
+        inserted = len(result.all())
+        await db.commit()
+        await contacts_changed(user_id)
+        return inserted, len(rows) - inserted, {}
+    except IntegrityError:
+        await db.rollback()
+
+    inserted, failed = 0, {}
+    for index, value in enumerate(values):
+        try:
+            result = await db.execute(_insert_ignoring_duplicates(db).values(value).returning(Contact.id))
+            inserted += len(result.all())
+            await db.commit()
+        except IntegrityError as err:
+            await db.rollback()
+            failed[index] = str(err.orig)
+    await contacts_changed(user_id)
+    return inserted, len(rows) - inserted - len(failed), failed
+
+
+async def update(id: int, body: ContactBase, user_id: int, db: AsyncSession):
     """
     The update function updates a contact in the database.
+        One UPDATE ... RETURNING scoped to the owner both checks ownership and
+        reads back the stored row, including updated_at set by the database.
         
     :param id: int: Identify the contact that will be updated
     :param body: ContactBase: Get the data from the request body
     :param user_id: int: Check if the contact belongs to the user
-    :param db: Session: Access the database
-    :return: A contact
+    :param db: AsyncSession: Access the database
+    :return: A row with the columns in RESPONSE_FIELDS, or None if the user has no such contact
     :doc-author: Trelent
     """
-    contact = await get_contact_by_id(id, db)
-    if contact and contact.user_id == user_id:
-        if body.email:
-            contact.email = body.email
-        if body.additional_data:
-            contact.additional_data = body.additional_data
-        if body.birth_date:
-            contact.birth_date = body.birth_date
-        db.commit()
+    values = {field: getattr(body, field) for field in ("email", "additional_data", "birth_date") if getattr(body, field)}
+    if not values:
+        return await get_contact_row(id, user_id, db)
+    stmt = (
+        sql_update(Contact)
+        .where(Contact.id == id, Contact.user_id == user_id)
+        .values(values)
+        .returning(*RESPONSE_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    contact = (await db.execute(stmt)).first()
+    await db.commit()
+    if contact is not None:
+        await contacts_changed(user_id)
     return contact
 
 
-
-async def remove(id: int, user_id: int, db: Session):
+async def remove(id: int, user_id: int, db: AsyncSession):
     """
-    The remove function removes a contact from the database.
-        
+    The remove function removes a contact from the database
+        with one DELETE ... RETURNING scoped to the owner.
     
     :param id: int: Specify the id of the contact to be deleted
     :param user_id: int: Check if the user is authorized to delete the contact
-    :param db: Session: Pass the database session to the function
-    :return: A contact object if it exists, otherwise none
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A row with the columns in RESPONSE_FIELDS if the contact existed, otherwise None
     :doc-author: Trelent
     """
-    contact = await get_contact_by_id(id, db)
-    if contact and contact.user_id == user_id:
-        db.delete(contact)
-        db.commit()
+    stmt = (
+        delete(Contact)
+        .where(Contact.id == id, Contact.user_id == user_id)
+        .returning(*RESPONSE_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    contact = (await db.execute(stmt)).first()
+    await db.commit()
+    if contact is not None:
+        await contacts_changed(user_id)
     return contact
 
 
-async def get_birthdays(start_date: date, end_date: date, db: Session, user: User):
-    birthdays = (
-        db.query(Contact)
-        .filter(Contact.birth_date >= start_date, Contact.birth_date <= end_date, Contact.user_id == user.id)
-        .all()
-    )
-    return birthdays
+def _id_in(db: AsyncSession, ids: list):
+    # On Postgres the chunk is one array parameter, so every chunk shares a single
+    # prepared statement instead of one per IN-list length.
+    if db.get_bind().dialect.name == "postgresql":
+        return Contact.id == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+    return Contact.id.in_(ids)
+
+
+def _filter_clauses(contact_filter: ContactFilter) -> list:
+    clauses = []
+    for field in ("first_name", "last_name", "email"):
+        value = getattr(contact_filter, field)
+        if value is not None:
+            clauses.append(getattr(Contact, field) == value)
+    if contact_filter.birth_date_from is not None:
+        clauses.append(Contact.birth_date >= contact_filter.birth_date_from)
+    if contact_filter.birth_date_to is not None:
+        clauses.append(Contact.birth_date <= contact_filter.birth_date_to)
+    if contact_filter.created_before is not None:
+        clauses.append(Contact.created_at < contact_filter.created_before)
+    return clauses
+
+
+def _selected(selection: ContactSelection, db: AsyncSession, chunk_size: int):
+    # A filter is applied by the UPDATE/DELETE itself, so matching ids are never
+    # loaded; explicit ids are sent in chunks of chunk_size.
+    if selection.ids is None:
+        yield _filter_clauses(selection.filter)
+        return
+    ids = sorted(set(selection.ids))
+    for start in range(0, len(ids), chunk_size):
+        yield [_id_in(db, ids[start:start + chunk_size])]
+
+
+async def bulk_update(changes: ContactChanges, selection: ContactSelection, user_id: int, db: AsyncSession,
+                      chunk_size: int = 500) -> int:
+    """
+    The bulk_update function applies the same changes to many of the user's contacts.
+        Contacts chosen by a filter are changed by one set-based UPDATE; explicit ids by
+        one UPDATE per chunk of ids. All statements run in one transaction, so either
+        every contact is changed or none is. Ids of other users' contacts or of missing
+        contacts are ignored.
+
+    :param changes: ContactChanges: The fields to set, only those sent by the client
+    :param selection: ContactSelection: The contact ids or the filter to match
+    :param user_id: int: The owner of the contacts
+    :param db: AsyncSession: Access the database
+    :param chunk_size: int: Ids per statement
+    :return: The number of contacts updated
+    """
+    values = {**changes.model_dump(exclude_unset=True), "updated_at": func.now()}
+    affected = 0
+    for clauses in _selected(selection, db, chunk_size):
+        stmt = (
+            sql_update(Contact)
+            .where(Contact.user_id == user_id, *clauses)
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        affected += (await db.execute(stmt)).rowcount
+    await db.commit()
+    if affected:
+        await contacts_changed(user_id)
+    return affected
+
+
+async def bulk_delete(selection: ContactSelection, user_id: int, db: AsyncSession, chunk_size: int = 500) -> int:
+    """
+    The bulk_delete function deletes many of the user's contacts, with one set-based
+        DELETE for a filter or one per chunk of ids, all in one transaction.
+        Ids the user does not own are ignored.
+
+    :param selection: ContactSelection: The contact ids or the filter to match
+    :param user_id: int: The owner of the contacts
+    :param db: AsyncSession: Access the database
+    :param chunk_size: int: Ids per statement
+    :return: The number of contacts deleted
+    """
+    affected = 0
+    for clauses in _selected(selection, db, chunk_size):
+        stmt = (
+            delete(Contact)
+            .where(Contact.user_id == user_id, *clauses)
+            .execution_options(synchronize_session=False)
+        )
+        affected += (await db.execute(stmt)).rowcount
+    await db.commit()
+    if affected:
+        await contacts_changed(user_id)
+    return affected
 
 
-async def search_contacts_by_last_name(last_name: str, db: Session, user: User):
-    contacts = db.query(Contact).filter_by(last_name=last_name, user_id=user.id).all()
-    return contacts
+def birthday_key(day: date) -> int:
+    return day.month * 100 + day.day
 
 
-async def search_contacts_by_first_name(first_name: str, db: Session, user: User):
-    contacts = db.query(Contact).filter_by(first_name=first_name, user_id=user.id).all()
-    return contacts
+async def get_birthdays(start_date: date, end_date: date, db: AsyncSession, user: User):
+    """
+    The get_birthdays function returns the user's contacts whose birthday falls between
+        start_date and end_date, whatever year they were born in.
+        The match is on the stored MMDD key (Contact.birth_md) through the
+        (user_id, birth_md) index; a window running past Dec 31 wraps to January.
+        The index only narrows the rows: their response columns are still read
+        from the table, which is cheap for a window of a few days.
+
+    :param start_date: date: First day of the window
+    :param end_date: date: Last day of the window, at most a year after start_date
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the user_id of the current user
+    :return: A list of rows, nearest birthday first, columns as in RESPONSE_FIELDS
+    """
+    start, end = birthday_key(start_date), birthday_key(end_date)
+    stmt = select(*RESPONSE_COLUMNS).filter(Contact.user_id == user.id)
+    if (end_date - start_date).days >= 365:
+        order = Contact.birth_md < start
+    elif start <= end:
+        stmt = stmt.filter(Contact.birth_md.between(start, end))
+        order = None
+    else:
+        stmt = stmt.filter(or_(Contact.birth_md >= start, Contact.birth_md <= end))
+        order = Contact.birth_md < start
+    if order is not None:
+        stmt = stmt.order_by(order)
+    stmt = stmt.order_by(Contact.birth_md, Contact.id)
+    birthdays = await db.execute(stmt)
+    return birthdays.all()
+
+
+async def search_contacts_by_last_name(last_name: str, db: AsyncSession, user: User):
+    stmt = select(*RESPONSE_COLUMNS).filter_by(last_name=last_name, user_id=user.id)
+    contacts = await db.execute(stmt)
+    return contacts.all()
+
+
+async def search_contacts_by_first_name(first_name: str, db: AsyncSession, user: User):
+    stmt = select(*RESPONSE_COLUMNS).filter_by(first_name=first_name, user_id=user.id)
+    contacts = await db.execute(stmt)
+    return contacts.all()
+
 
+async def search_contact_by_email(email: str, db: AsyncSession, user: User):
+    stmt = select(*RESPONSE_COLUMNS).filter_by(email=email, user_id=user.id)
+    contact = await db.execute(stmt)
+    return contact.first()
 
-async def search_contact_by_email(email: str, db: Session, user: User):
-    contact = db.query(Contact).filter_by(email=email, user_id=user.id).first()
-    return contact
\ No newline at end of file
+
+def _like_prefix(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+async def search_contacts(q: str, db: AsyncSession, user: User, limit: int = 20):
+    """
+    The search_contacts function finds the user's contacts matching ``q`` in any of
+        first name, last name, email or phone number, best matches first.
+        On Postgres a field matches on a case-insensitive prefix or on pg_trgm similarity,
+        both served by the trigram GIN indexes; the rank is the best similarity plus
+        one for a prefix match. Other databases fall back to prefix and substring matching.
+
+    :param q: str: The search text
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the user_id of the current user
+    :param limit: int: Maximum number of contacts to return
+    :return: A list of rows ordered by relevance, columns as in RESPONSE_FIELDS
+    """
+    term = q.strip().lower()
+    fields = (
+        func.lower(Contact.first_name),
+        func.lower(Contact.last_name),
+        func.lower(Contact.email),
+        Contact.phone_number,
+    )
+    prefix = or_(*(field.like(_like_prefix(term), escape="\\") for field in fields))
+    if db.get_bind().dialect.name == "postgresql":
+        similar = or_(*(field.op("%")(term) for field in fields))
+        rank = func.greatest(*(func.similarity(field, term) for field in fields)) + case((prefix, 1.0), else_=0.0)
+        condition = or_(prefix, similar)
+    else:
+        contains = or_(*(func.instr(field, term) > 0 for field in fields))
+        rank = case((prefix, 2), (contains, 1), else_=0)
+        condition = or_(prefix, contains)
+    stmt = (
+        select(*RESPONSE_COLUMNS)
+        .filter(Contact.user_id == user.id, condition)
+        .order_by(rank.desc(), Contact.id)
+        .limit(limit)
+    )
+    contacts = await db.execute(stmt)
+    return contacts.all()
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import EmailOutbox
+
+
+async def enqueue_email(email: str, username: str, host: str, db: AsyncSession, commit: bool = True) -> EmailOutbox:
+    """
+    The enqueue_email function stores a confirmation email in the outbox.
+        The email is sent later by the outbox worker, so it survives a restart
+        of the web worker that accepted the request.
+
+    :param email: str: The recipient
+    :param username: str: Shown in the email
+    :param host: str: Base url of the application, used in the confirmation link
+    :param db: AsyncSession: Access the database
+    :param commit: bool: Leave the row to the caller's transaction when False
+    :return: The outbox row
+    """
+    message = EmailOutbox(recipient=email, username=username, host=host, status="pending", attempts=0,
+                          next_attempt_at=datetime.utcnow())
+    db.add(message)
+    if commit:
+        await db.commit()
+    return message
+
+
+async def claim_batch(db: AsyncSession, limit: int, lease: timedelta) -> list:
+    """
+    The claim_batch function takes up to ``limit`` due emails for one worker.
+        Claimed rows are pushed ``lease`` into the future, so other workers skip them
+        and a worker that dies mid-batch only delays them. On Postgres rows locked by
+        another worker's claim are skipped (FOR UPDATE SKIP LOCKED).
+
+    :param db: AsyncSession: Access the database
+    :param limit: int: Maximum number of emails to claim
+    :param lease: timedelta: How long the claim holds
+    :return: A list of outbox rows
+    """
+    now = datetime.utcnow()
+    stmt = (
+        select(EmailOutbox)
+        .filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    messages = (await db.execute(stmt)).scalars().all()
+    if messages:
+        await db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_([message.id for message in messages]))
+            .values(next_attempt_at=now + lease)
+        )
+    await db.commit()
+    return messages
+
+
+async def mark_sent(ids: list, db: AsyncSession) -> None:
+    if ids:
+        await db.execute(
+            update(EmailOutbox).where(EmailOutbox.id.in_(ids)).values(status="sent", sent_at=datetime.utcnow())
+        )
+        await db.commit()
+
+
+async def mark_failed(message: EmailOutbox, error: str, retry_in: timedelta | None, db: AsyncSession) -> None:
+    """
+    The mark_failed function records a failed attempt.
+        The email is retried after ``retry_in``, or given up on when it is None.
+
+    :param message: EmailOutbox: The row that failed
+    :param error: str: What went wrong
+    :param retry_in: timedelta | None: Delay before the next attempt
+    :param db: AsyncSession: Access the database
+    """
+    values = {"attempts": message.attempts + 1, "last_error": error[:1000]}
+    if retry_in is None:
+        values["status"] = "failed"
+    else:
+        values["next_attempt_at"] = datetime.utcnow() + retry_in
+    await db.execute(update(EmailOutbox).where(EmailOutbox.id == message.id).values(**values))
+    await db.commit()
@@ -1,21 +1,29 @@
 from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 from src.schemas import UserBase
+from src.services.user_cache import user_cache
 
 
-async def get_user_by_email(email: str, db: Session) -> User | None:
-    return db.query(User).filter_by(email=email).first()
+async def get_user_by_email(email: str, db: AsyncSession) -> User | None:
+    stmt = select(User).filter_by(email=email)
+    user = await db.execute(stmt)
+    return user.scalars().first()
 
 
-async def create_user(body: UserBase, db: Session):
+async def get_user_by_id(user_id: int, db: AsyncSession) -> User | None:
+    return await db.get(User, user_id)
+
+
+async def create_user(body: UserBase, db: AsyncSession):
     """
     The create_user function creates a new user in the database.
         
     
     :param body: UserBase: Pass the data from the request into this function
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: A user object
     :doc-author: Trelent
     """
@@ -23,36 +31,65 @@ async def create_user(body: UserBase, db: Session):
 
     new_user = User(**body.model_dump(), avatar=g.get_image())
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, refresh_token, db: Session):
-    user.refresh_token = refresh_token
-    db.commit()
-    
-async def confirmed_email(email: str, db: Session) -> None:
-    user = await get_user_by_email(email, db)
-    user.confirmed = True
-    db.commit()
-    
-async def update_avatar(email, url: str, db: Session) -> User:
+async def revoke_tokens(user_id: int, db: AsyncSession) -> int:
+    """
+    The revoke_tokens function bumps the user's token_version, which invalidates
+        every access token issued so far.
+
+    :param user_id: int: The user whose tokens are revoked
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The new token_version
+    """
+    stmt = (
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1)
+        .returning(User.email, User.token_version)
+    )
+    email, version = (await db.execute(stmt)).one()
+    await db.commit()
+    await user_cache.invalidate(email)
+    return version
+
+
+async def confirmed_email(email: str, db: AsyncSession) -> bool:
+    """
+    The confirmed_email function marks the user's email as confirmed with one UPDATE ... RETURNING.
+
+    :param email: str: The email from the confirmation token
+    :param db: AsyncSession: Pass the database session to the function
+    :return: True if an unconfirmed user was confirmed, False if there is no such user or it was already confirmed
+    """
+    stmt = update(User).where(User.email == email, User.confirmed.isnot(True)).values(confirmed=True).returning(User.id)
+    confirmed = (await db.execute(stmt)).first() is not None
+    await db.commit()
+    if confirmed:
+        await user_cache.invalidate(email)
+    return confirmed
+
+
+async def update_avatar(email, url: str, db: AsyncSession) -> User:
     """
     The update_avatar function updates the avatar of a user.
     
     Args:
         email (str): The email address of the user to update.
         url (str): The URL for the new avatar image.
-        db (Session, optional): A database session object to use instead of creating one locally. Defaults to None.  # noQA: E501 line too long
+        db (AsyncSession, optional): A database session object to use instead of creating one locally. Defaults to None.  # noQA: E501 line too long
     
     :param email: Get the user by email
     :param url: str: Specify the type of data that will be passed to the function
-    :param db: Session: Pass the database session to the function
-    :return: A user object
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The updated user, read back by the same UPDATE ... RETURNING
     :doc-author: Trelent
     """
-    user = await get_user_by_email(email, db)
-    user.avatar = url
-    db.commit()
+    stmt = update(User).where(User.email == email).values(avatar=url).returning(User)
+    user = (await db.scalars(stmt)).first()
+    await db.commit()
+    await user_cache.invalidate(email)
     return user
@@ -1,48 +1,58 @@
 
-from fastapi import Depends, HTTPException, status, APIRouter, Security, BackgroundTasks, Request
+from fastapi import Depends, HTTPException, status, APIRouter, Security, Request, Response
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
-from src.schemas import RequestEmail, UserBase, UserResponse, TokenModel
+from src.database.models import User
+from src.schemas import RequestEmail, SessionsRevoked, UserBase, UserResponse, TokenModel
 from src. repository import users as repository_users
+from src.repository import outbox as repository_outbox
 from src.services.auth import auth_service
-from src.services.emails import send_email
+from src.services.query_guard import query_budget
+from src.services.revocations import revocations
+from src.services.sessions import session_store
 
 router = APIRouter(prefix="/auth", tags=['auth'])
 security = HTTPBearer()
 
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(body: UserBase, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+@query_budget(4)
+async def signup(body: UserBase, request: Request, db: AsyncSession = Depends(get_db)):
     """
     The signup function creates a new user in the database.
         It takes an email and password as input, hashes the password, and stores it in the database.
-        The function also sends an email to confirm that this is a valid account.
+        The function also queues an email to confirm that this is a valid account;
+        the outbox worker sends it.
     
     :param body: UserBase: Get the data from the request body
-    :param background_tasks: BackgroundTasks: Add a task to the background queue
     :param request: Request: Get the base url of the application
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A new user
     :doc-author: Trelent
     """
     exist_user = await repository_users.get_user_by_email(body.email, db)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash_async(body.password)
+    # Queued in the same transaction as the user, so neither is stored without the other.
+    await repository_outbox.enqueue_email(body.email, body.username, str(request.base_url), db, commit=False)
     new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
     return new_user
 
 
 @router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@query_budget(1)
+async def login(request: Request, body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     The login function is used to authenticate a user.
+        Every login opens a new session in session_store, so a user can stay
+        logged in on several devices at once.
     
+    :param request: Request: Read the User-Agent stored with the session
     :param body: OAuth2PasswordRequestForm: Get the username and password from the request body
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :return: A dictionary with the access_token and refresh_token, but i don't know how to use them
     :doc-author: Trelent
     """
@@ -51,77 +61,120 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not confirmed email")
-    if not auth_service.verify_password(body.password, user.password):
+    if not await auth_service.verify_password_async(body.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
     # Generate JWT
-    access_token = await auth_service.create_access_token(data={"sub": user.email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repository_users.update_token(user, refresh_token, db)
+    jti = await session_store.create(user.email, request.headers.get("user-agent"))
+    access_token = await auth_service.create_access_token(data=auth_service.access_claims(user))
+    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email, "jti": jti})
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+@query_budget(1)
+async def refresh_token(request: Request, credentials: HTTPAuthorizationCredentials = Security(security),
+                        db: AsyncSession = Depends(get_db)):
     """
     The refresh_token function is used to refresh the access token.
     It takes in a refresh token and returns an access_token, a new refresh_token, and the type of token (bearer).
+    The session of the refresh token is rotated in session_store and the users table is only read,
+    through user_cache, for the claims of the new access token.
+    A refresh token whose session is gone (used before, or logged out) is treated as stolen
+    and ends every session of the user.
     
-    
+    :param request: Request: Read the User-Agent stored with the new session
     :param credentials: HTTPAuthorizationCredentials: Get the credentials from the request header
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :return: A dictionary with the access_token, refresh_token and token_type keys
     :doc-author: Trelent
     """
-    token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
-    user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
+    payload = auth_service.decode_refresh_token(credentials.credentials)
+    email = payload["sub"]
+    jti = await session_store.rotate(payload["jti"], email, request.headers.get("user-agent"))
+    if jti is None:
+        await session_store.revoke_all(email)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    user = await auth_service.load_user(email, db)
+    if user is None:
+        await session_store.pop(jti, email)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-    access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repository_users.update_token(user, refresh_token, db)
+    access_token = await auth_service.create_access_token(data=auth_service.access_claims(user))
+    refresh_token = await auth_service.create_refresh_token(data={"sub": email, "jti": jti})
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
+
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(0)
+async def logout(credentials: HTTPAuthorizationCredentials = Security(security)):
+    """
+    The logout function ends the session of the refresh token sent as the bearer credentials.
+        Other devices stay logged in.
+
+    :param credentials: HTTPAuthorizationCredentials: The refresh token
+    :return: An empty 204 response
+    """
+    payload = auth_service.decode_refresh_token(credentials.credentials)
+    await session_store.pop(payload["jti"], payload["sub"])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post('/logout_all', response_model=SessionsRevoked)
+@query_budget(2)
+async def logout_all(current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_db)):
+    """
+    The logout_all function ends every session of the current user, on all devices.
+        Refresh tokens stop working at once. Access tokens are revoked by bumping the
+        user's token_version; with settings.auth_stateless other workers refuse them
+        once their revocation list syncs (settings.revocation_sync_interval).
+
+    :param current_user: User: The user, authenticated by an access token
+    :param db: AsyncSession: Access the database
+    :return: The number of sessions ended
+    """
+    revoked = await session_store.revoke_all(current_user.email)
+    version = await repository_users.revoke_tokens(current_user.id, db)
+    await revocations.revoke(current_user.id, version)
+    return SessionsRevoked(revoked=revoked)
+
+
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+@query_budget(2)
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     The confirmed_email function is used to confirm a user's email address.
         It takes the token from the URL and uses it to get the user's email address.
-        Then, it checks if that user exists in our database, and if they do not exist, 
-        an error message is returned. If they do exist but their email has already been confirmed,
-        another error message is returned. Otherwise (if everything goes well), we update their 
-        record in our database so that their &quot;confirmed&quot; field becomes True.
+        Then it sets their &quot;confirmed&quot; field to True with a single UPDATE.
+        Only when nothing was updated does it look the user up, to tell an unknown
+        user (an error) from an already confirmed one.
     
     :param token: str: Get the email from the token
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A dict with the key &quot;message&quot; and the value &quot;email confirmed&quot;
     :doc-author: Trelent
     """
     email = auth_service.get_email_from_token(token)
+    if await repository_users.confirmed_email(email, db):
+        return {"message": "Email confirmed"}
+    # Nothing was updated: either the user is unknown or already confirmed.
     user = await repository_users.get_user_by_email(email, db)
     if user is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Verification error")
-    if user.confirmed:
-        return {"message": "Your email is already confirmed"}
-    await repository_users.confirmed_email(email, db)
-    return {"message": "Email confirmed"}
+    return {"message": "Your email is already confirmed"}
 
 @router.post('/request_email')
-async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+@query_budget(2)
+async def request_email(body: RequestEmail, request: Request, db: AsyncSession = Depends(get_db)):
     """
     The request_email function is used to send an email to the user with a link that they can click on
     to confirm their email address. The function takes in a RequestEmail object, which contains the user's
     email address, and then uses this information to find the corresponding User object in our database. If 
-    the User exists and has not yet confirmed their email address, we use Celery (a task queue) to add a 
-    task that will send an email containing a confirmation link for them.
+    the User exists and has not yet confirmed their email address, we queue an email containing a
+    confirmation link for them in the outbox.
     
     :param body: RequestEmail: Get the email from the body of the request
-    :param background_tasks: BackgroundTasks: Add a task to the background tasks queue
     :param request: Request: Get the base url of the application
-    :param db: Session: Pass the database session to the repository functions
+    :param db: AsyncSession: Pass the database session to the repository functions
     :return: A dictionary with a message
     :doc-author: Trelent
     """
@@ -129,5 +182,5 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     if user:
         if user.confirmed:
             return {"message": "Your email is already confirmed"}
-        background_tasks.add_task(send_email, user.email, user.username, request.base_url)
+        await repository_outbox.enqueue_email(user.email, user.username, str(request.base_url), db)
     return {"message": "Check your email for confirmation."}
\ No newline at end of file
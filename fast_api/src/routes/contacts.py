@@ -2,73 +2,153 @@ from typing import List
 from datetime import date, timedelta
 
 
-from fastapi import Depends, HTTPException, status, Path, APIRouter
-from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, status, Path, APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.database.models import User
 from src.repository import contacts as repository_contacts
-from src.schemas import ContactResponse, ContactBase, UserBase, UserResponse
+from src.conf.config import settings
+from src.schemas import (
+    ContactResponse, ContactBase, ContactBulkAffected, ContactBulkResult, ContactBulkUpdate, ContactPage,
+    ContactRowError, ContactSelection, UserBase, UserResponse,
+)
 from src.services.auth import auth_service
+from src.services.contacts_version import check_not_modified
+from src.services.export import csv_chunks, json_response, ndjson_chunks, row_dicts
+from src.services.imports import parse_rows, validate_rows
+from src.services.pagination import decode_cursor, encode_cursor
+from src.services.query_guard import query_budget
 
 
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
-# need to add "skip limit"
 
+@router.get("/", response_model=ContactPage, name="Return contacts")
+@query_budget(2)
+async def get_contacts(request: Request, response: Response,
+                       limit: int = Query(50, ge=1, le=500), cursor: str | None = None,
+                       db: AsyncSession = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The get_contacts function returns one page of contacts for the current user.
+        Pages are keyset based: ``next_cursor`` of a page is passed back as ``cursor``
+        to get the following one, and is null on the last page.
+        Supports If-None-Match: an unchanged address book is answered with a 304.
+    
+    :param request: Request: Read the If-None-Match header
+    :param response: Response: Set the ETag and Last-Modified headers
+    :param limit: int: Maximum number of contacts in the page
+    :param cursor: str | None: The next_cursor of the previous page
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: User: Get the current user
+    :return: A page of contacts and the cursor of the next page, encoded by json_response
+    :doc-author: Trelent
+    """
+    not_modified = await check_not_modified(request, response, current_user.id)
+    if not_modified is not None:
+        return not_modified
+    after = decode_cursor(cursor, (str, int)) if cursor else None
+    contacts = await repository_contacts.get_contacts(db, current_user, limit + 1, after)
+    next_cursor = None
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        next_cursor = encode_cursor(contacts[-1].last_name, contacts[-1].id)
+    return json_response(
+        {"items": row_dicts(contacts, repository_contacts.RESPONSE_FIELDS), "next_cursor": next_cursor}, response
+    )
 
-@router.get("/", response_model=List[ContactResponse], name="Return contacts")
 
-async def get_contacts(db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+@router.get("/export", name="Export contacts")
+@query_budget(2)
+async def export_contacts(format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                          db: AsyncSession = Depends(get_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
     """
-    The get_contacts function returns a list of contacts for the current user.
-        
+    The export_contacts function streams the whole address book of the current user.
+        Rows are read from a server-side cursor and written chunk by chunk, so memory
+        stays flat and the first bytes go out before the last rows are read.
     
-    :param db: Session: Pass the database session to the function
+    :param format: str: ``ndjson`` (default) or ``csv``
+    :param db: AsyncSession: Pass the database session to the function
     :param current_user: User: Get the current user
-    :return: A list of contacts
+    :return: A streaming response with one contact per line
     :doc-author: Trelent
     """
-    contacts = await repository_contacts.get_contacts(db, current_user)
-    return contacts
+    partitions = repository_contacts.stream_contacts(db, current_user)
+    columns = repository_contacts.EXPORT_COLUMNS
+    if format == "csv":
+        return StreamingResponse(
+            csv_chunks(partitions, columns),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="contacts.csv"'},
+        )
+    return StreamingResponse(ndjson_chunks(partitions, columns), media_type="application/x-ndjson")
 
 
 @router.get("/search_by_id/{id}", response_model=ContactResponse)
-async def get_contact(id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+@query_budget(2)
+async def get_contact(id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
     """
     The get_contact function returns a contact by id.
         Args:
             id (int): The ID of the contact to return.
-            db (Session, optional): SQLAlchemy Session. Defaults to Depends(get_db).
+            db (AsyncSession, optional): SQLAlchemy AsyncSession. Defaults to Depends(get_db).
             current_user (User, optional): User object from auth_service.get_current_user(). Defaults to Depends(auth_service.get_current_user).
         Returns:
             Contact: A single Contact object matching the specified ID.
     
     :param id: int: Specify the type of data that will be passed in
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :param current_user: User: Get the current user
     :return: The contact object
     :doc-author: Trelent
     """
-    contact = await repository_contacts.get_contact_by_id(id, db)
+    contact = await repository_contacts.get_contact_row(id, current_user.id, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
-    return contact
+    return json_response(contact._asdict())
 
 
 
+@router.get("/search", response_model=List[ContactResponse], name="Search contacts")
+@query_budget(2)
+async def search_contacts(q: str = Query(min_length=1, max_length=100), limit: int = Query(20, ge=1, le=100),
+                          db: AsyncSession = Depends(get_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The search_contacts function searches the current user's contacts by name, email and phone.
+        Matching is case-insensitive on prefixes and fuzzy (trigram) on Postgres,
+        and the best matches come first.
+    
+    :param q: str: The search text
+    :param limit: int: Maximum number of contacts to return
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: User: Get the current user
+    :return: A list of contacts ordered by relevance, encoded by json_response
+    :doc-author: Trelent
+    """
+    q = q.strip()
+    if not q:
+        # A blank prefix would match every contact.
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="q must not be blank")
+    contacts = await repository_contacts.search_contacts(q, db, current_user, limit)
+    return json_response(row_dicts(contacts, repository_contacts.RESPONSE_FIELDS))
+
+
 @router.get(
     "/search_by_last_name/{last_name}",
     response_model=List[ContactResponse],
     name="Search contacts by last name",
 )
-async def search_contacts_by_last_name(last_name: str, db: Session = Depends(get_db),
+@query_budget(2)
+async def search_contacts_by_last_name(last_name: str, db: AsyncSession = Depends(get_db),
                                        current_user: User = Depends(auth_service.get_current_user)):
     contact = await repository_contacts.search_contacts_by_last_name(last_name, db, current_user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
-    return contact
+    return json_response(row_dicts(contact, repository_contacts.RESPONSE_FIELDS))
 
 
 @router.get(
@@ -76,31 +156,33 @@ async def search_contacts_by_last_name(last_name: str, db: Session = Depends(get
     response_model=List[ContactResponse],
     name="Search contacts by first name",
 )
-async def search_contacts_by_first_name(first_name: str, db: Session = Depends(get_db),
+@query_budget(2)
+async def search_contacts_by_first_name(first_name: str, db: AsyncSession = Depends(get_db),
                                         current_user: User = Depends(auth_service.get_current_user)):
     contact = await repository_contacts.search_contacts_by_first_name(first_name, db, current_user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
-    return contact
+    return json_response(row_dicts(contact, repository_contacts.RESPONSE_FIELDS))
 
 
 @router.get(
     "/search_by_email/{email}",
-    response_model=List[ContactResponse],
+    response_model=ContactResponse,
     name="Search contacts by email",
 )
-async def search_contacts_by_email(email: str, db: Session = Depends(get_db),
+@query_budget(2)
+async def search_contacts_by_email(email: str, db: AsyncSession = Depends(get_db),
                                    current_user: User = Depends(auth_service.get_current_user)):
     """
     The search_contacts_by_email function searches for a contact by email.
         Args:
             email (str): The email of the contact to search for.
-            db (Session, optional): SQLAlchemy Session. Defaults to Depends(get_db).
+            db (AsyncSession, optional): SQLAlchemy AsyncSession. Defaults to Depends(get_db).
             current_user (User, optional): Current user object from auth_service module's get_current_user function. 
                 Defaults to Depends(auth_service.get_current_user).
     
     :param email: str: Specify the email of the contact we want to search for
-    :param db: Session: Pass the database session to the repository layer
+    :param db: AsyncSession: Pass the database session to the repository layer
     :param current_user: User: Get the user_id of the current user
     :return: A contact object
     :doc-author: Trelent
@@ -108,37 +190,121 @@ async def search_contacts_by_email(email: str, db: Session = Depends(get_db),
     contact = await repository_contacts.search_contact_by_email(email, db, current_user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
-    return contact
+    return json_response(contact._asdict())
 
 
 @router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
-async def create_contacts(body: ContactBase, db: Session = Depends(get_db),
+@query_budget(2)
+async def create_contacts(body: ContactBase, db: AsyncSession = Depends(get_db),
                           current_user: User = Depends(auth_service.get_current_user)):
     """
     The create_contacts function creates a new contact in the database.
         Args:
             body (ContactBase): The contact to create.
-            db (Session, optional): SQLAlchemy Session. Defaults to Depends(get_db).
+            db (AsyncSession, optional): SQLAlchemy AsyncSession. Defaults to Depends(get_db).
             current_user (User, optional): Current user object from auth middleware. Defaults to Depends(auth_service.get_current_user).
     
     :param body: ContactBase: Get the contact information from the request body
-    :param db: Session: Pass in the database session to the function
+    :param db: AsyncSession: Pass in the database session to the function
     :param current_user: User: Get the current user from the database
     :return: A contact object
     :doc-author: Trelent
     """
-    contact = await repository_contacts.get_contact_by_email(body.email, db, current_user)
-    if contact:
+    contact = await repository_contacts.create(body.model_dump(include=set(repository_contacts.CREATE_FIELDS)), db, current_user)
+    if contact is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Email already exists!"
         )
-
-    contact = await repository_contacts.create(body, db)
     return contact
 
 
+@router.post("/bulk", response_model=ContactBulkResult, name="Import contacts")
+@query_budget(None)
+async def bulk_create_contacts(request: Request,
+                               chunk_size: int | None = Query(None, ge=1, le=repository_contacts.MAX_BULK_CHUNK),
+                               db: AsyncSession = Depends(get_db),
+                               current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The bulk_create_contacts function imports many contacts in one request.
+        The body is a JSON array, NDJSON (``application/x-ndjson``) or CSV (``text/csv``).
+        Rows are validated and inserted in chunks; invalid rows are reported by index
+        and contacts with an email the user already has are skipped.
+    
+    :param request: Request: Read the raw body and its Content-Type
+    :param chunk_size: int | None: Rows per INSERT, defaults to settings.contacts_bulk_chunk_size
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: User: Get the current user
+    :return: Inserted and skipped counts and the per-row errors
+    :doc-author: Trelent
+    """
+    try:
+        rows = parse_rows(await request.body(), request.headers.get("content-type", "application/json"))
+    except (ValueError, UnicodeDecodeError) as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    chunk_size = chunk_size or min(settings.contacts_bulk_chunk_size, repository_contacts.MAX_BULK_CHUNK)
+    user_id = current_user.id
+    result = ContactBulkResult()
+    for start in range(0, len(rows), chunk_size):
+        valid, errors = validate_rows(rows[start:start + chunk_size], offset=start)
+        result.errors.extend(ContactRowError(row=error.row, detail=error.detail) for error in errors)
+        if not valid:
+            continue
+        inserted, skipped, failed = await repository_contacts.bulk_create([row for _, row in valid], user_id, db)
+        result.inserted += inserted
+        result.skipped += skipped
+        result.errors.extend(ContactRowError(row=valid[index][0], detail=detail) for index, detail in failed.items())
+    result.errors.sort(key=lambda error: error.row)
+    return result
+
+
+@router.patch("/bulk", response_model=ContactBulkAffected, name="Update contacts")
+@query_budget(None)
+async def bulk_update_contacts(body: ContactBulkUpdate, chunk_size: int | None = Query(None, ge=1, le=5000),
+                               db: AsyncSession = Depends(get_db),
+                               current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The bulk_update_contacts function applies the same changes to many contacts at once.
+        Contacts are chosen by ``ids`` or by a ``filter``; ids the user does not own are ignored.
+        The update is set-based and runs in one transaction.
+
+    :param body: ContactBulkUpdate: The selection and the fields to change
+    :param chunk_size: int | None: Ids per UPDATE, defaults to settings.contacts_bulk_chunk_size
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: User: Get the current user
+    :return: The number of contacts updated
+    :doc-author: Trelent
+    """
+    affected = await repository_contacts.bulk_update(
+        body.changes, body, current_user.id, db, chunk_size or settings.contacts_bulk_chunk_size
+    )
+    return ContactBulkAffected(affected=affected)
+
+
+@router.post("/bulk-delete", response_model=ContactBulkAffected, name="Delete contacts")
+@query_budget(None)
+async def bulk_delete_contacts(body: ContactSelection, chunk_size: int | None = Query(None, ge=1, le=5000),
+                               db: AsyncSession = Depends(get_db),
+                               current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The bulk_delete_contacts function deletes many contacts at once, chosen by ``ids``
+        or by a ``filter``. Ids the user does not own are ignored.
+
+    :param body: ContactSelection: The contacts to delete
+    :param chunk_size: int | None: Ids per DELETE, defaults to settings.contacts_bulk_chunk_size
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: User: Get the current user
+    :return: The number of contacts deleted
+    :doc-author: Trelent
+    """
+    affected = await repository_contacts.bulk_delete(
+        body, current_user.id, db, chunk_size or settings.contacts_bulk_chunk_size
+    )
+    return ContactBulkAffected(affected=affected)
+
+
 @router.put("/{id}", response_model=ContactResponse)
-async def update_contact(body: ContactBase, id: int, db: Session = Depends(get_db),
+@query_budget(2)
+async def update_contact(body: ContactBase, id: int, db: AsyncSession = Depends(get_db),
                          current_user: User = Depends(auth_service.get_current_user)):
     """
     The update_contact function updates a contact in the database.
@@ -147,12 +313,12 @@ async def update_contact(body: ContactBase, id: int, db: Session = Depends(get_d
     
     :param body: ContactBase: Pass the data from the request body to the function
     :param id: int: Identify the contact to be updated
-    :param db: Session: Pass the database session to the repository layer
+    :param db: AsyncSession: Pass the database session to the repository layer
     :param current_user: User: Get the current user from the database
     :return: The updated contact
     :doc-author: Trelent
     """
-    contact = await repository_contacts.update(id, body, db, current_user)
+    contact = await repository_contacts.update(id, body, current_user.id, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
 
@@ -160,48 +326,58 @@ async def update_contact(body: ContactBase, id: int, db: Session = Depends(get_d
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-async def remove_contact(id: int, db: Session = Depends(get_db),
+@query_budget(2)
+async def remove_contact(id: int, db: AsyncSession = Depends(get_db),
                          current_user: User = Depends(auth_service.get_current_user)):
     """
     The remove_contact function removes a contact from the database.
         Args:
             id (int): The ID of the contact to remove.
-            db (Session, optional): A database session object for interacting with the database. Defaults to Depends(get_db).
+            db (AsyncSession, optional): A database session object for interacting with the database. Defaults to Depends(get_db).
             current_user (User, optional): The currently authenticated user object for authorization purposes. Defaults to Depends(auth_service.get_current_user).
         Returns:
             Contact: A Contact object representing the removed contact.
     
     :param id: int: Specify the id of the contact to be removed
-    :param db: Session: Pass the database session to the repository layer
+    :param db: AsyncSession: Pass the database session to the repository layer
     :param current_user: User: Get the current user from the auth_service
-    :return: A contact object
+    :return: An empty 204 response
     :doc-author: Trelent
     """
-    contact = await repository_contacts.remove(id, db, current_user)
+    contact = await repository_contacts.remove(id, current_user.id, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
-    return contact
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.get(
     "/birthdays", response_model=List[ContactResponse], name="Upcoming Birthdays"
 )
-async def get_birthdays(db: Session = Depends(get_db),
+@query_budget(2)
+async def get_birthdays(request: Request, response: Response,
+                        days: int | None = Query(None, ge=0, le=366), db: AsyncSession = Depends(get_db),
                         current_user: User = Depends(auth_service.get_current_user)):
     """
-    The get_birthdays function returns a list of contacts with birthdays in the next 7 days.
-        The function takes two parameters:
+    The get_birthdays function returns a list of contacts with birthdays in the next days.
+        The function takes three parameters:
+            - days: The size of the window, settings.birthdays_window_days (7) by default.
             - db: A database connection object, which is passed by default from the get_db() function.
             - current_user: An authenticated user object, which is passed by default from the auth_service.get_current_user() function.
     
-    :param db: Session: Get the database connection
+    :param request: Request: Read the If-None-Match header
+    :param response: Response: Set the ETag and Last-Modified headers
+    :param days: int | None: How many days ahead to look
+    :param db: AsyncSession: Get the database connection
     :param current_user: User: Get the current user from the database
-    :return: A list of contacts that have a birthday in the next 7 days
+    :return: A list of contacts that have a birthday in the window, nearest first
     :doc-author: Trelent
     """
     today = date.today()
-    end_date = today + timedelta(days=7)
+    not_modified = await check_not_modified(request, response, current_user.id, today.isoformat())
+    if not_modified is not None:
+        return not_modified
+    end_date = today + timedelta(days=settings.birthdays_window_days if days is None else days)
     birthdays = await repository_contacts.get_birthdays(today, end_date, db, current_user)
     if birthdays is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
-    return birthdays
+    return json_response(row_dicts(birthdays, repository_contacts.RESPONSE_FIELDS), response)
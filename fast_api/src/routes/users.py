@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File
+from fastapi.responses import FileResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 from src.database.db import get_db
@@ -8,12 +10,47 @@ from src.repository import users as repository_users
 from src.services.auth import auth_service
 from src.conf.config import settings
 from src.schemas import UserResponse
-from src.services.cloud_image import CloudImage
+from src.services.avatars import avatar_thumbnail, store_avatar, thumbnail_key
+from src.services.query_guard import query_budget
 
-router = APIRouter(prefix="/users", tags=["users"])
+MULTIPART_OVERHEAD = 64 * 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Rejects request bodies larger than an avatar upload while they are received,
+    before FastAPI spools the multipart form to disk.
+    """
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request):
+            limit = settings.avatar_max_bytes + MULTIPART_OVERHEAD
+            declared = request.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > limit:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large")
+            receive = request.receive
+            received = 0
+
+            async def limited_receive():
+                nonlocal received
+                message = await receive()
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large")
+                return message
+
+            return await handler(Request(request.scope, limited_receive))
+
+        return limited_handler
+
+
+router = APIRouter(prefix="/users", tags=["users"], route_class=UploadLimitRoute)
 
 
 @router.get("/me/", response_model=UserResponse)
+@query_budget(1)
 async def read_users_me(current_user: User = Depends(auth_service.get_current_user)):
     """
     The read_users_me function returns the current user's information.
@@ -33,23 +70,50 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 
 
 @router.patch('/avatar', response_model=UserResponse)
+@query_budget(2)
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+                             db: AsyncSession = Depends(get_db)):
     """
     The update_avatar_user function updates the avatar of a user.
         Args:
             file (UploadFile): The image to be uploaded.
             current_user (User): The user whose avatar is being updated.
-            db (Session): A database session for interacting with the database.
+            db (AsyncSession): A database session for interacting with the database.
     
     :param file: UploadFile: Get the file from the request
     :param current_user: User: Get the current user from the database
-    :param db: Session: Pass the database session to the repository layer
+    :param db: AsyncSession: Pass the database session to the repository layer
     :return: A user object, but i want to return the src_url variable
     :doc-author: Trelent
     """
-    public_id = CloudImage.generate_name_avatar(current_user.email)
-    r = CloudImage.upload(file.file, public_id)
-    src_url = CloudImage.get_url_for_avatar(public_id, r)
+    src_url = await store_avatar(file, current_user.email)
     user = await repository_users.update_avatar(current_user.email, src_url, db)
-    return user
\ No newline at end of file
+    return user
+
+
+@router.get('/{user_id}/avatar', response_class=FileResponse)
+@query_budget(1)
+async def get_avatar(request: Request, user_id: int, size: int = Query(settings.avatar_size, ge=16, le=512),
+                     v: str | None = Query(None), db: AsyncSession = Depends(get_db)):
+    """
+    The get_avatar function serves a user's avatar as a thumbnail from the local disk cache.
+        The ETag is the thumbnail key, derived from the avatar url and size, so it changes
+        whenever the avatar does. Requests carrying it as ``v`` may be cached forever;
+        plain requests are revalidated with If-None-Match.
+
+    :param request: Request: Read If-None-Match
+    :param user_id: int: The user whose avatar is requested
+    :param size: int: Width and height of the thumbnail
+    :param v: str | None: The avatar version, as returned in the ETag
+    :param db: AsyncSession: Access the database
+    :return: The thumbnail, or 304 when the client already has it
+    """
+    user = await repository_users.get_user_by_id(user_id, db)
+    if user is None or not user.avatar:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    key = thumbnail_key(user.avatar, size)
+    headers = {"ETag": f'"{key}"', "Cache-Control": IMMUTABLE if v == key else "public, no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    path = await avatar_thumbnail(user.avatar, size)
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
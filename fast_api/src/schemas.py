@@ -1,7 +1,7 @@
 from datetime import date, datetime
+from typing import List
 
-from pydantic import BaseModel, Field, EmailStr
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator, model_validator
 
 class ContactBase(BaseModel):
     id: int
@@ -10,7 +10,7 @@ class ContactBase(BaseModel):
     email: EmailStr
     phone_number: str
     birth_date: date
-    additional_data: str = None
+    additional_data: str | None = None
     created_at: datetime
     updated_at: datetime
     user_id: int = Field(1, ge=0)
@@ -25,7 +25,7 @@ class ContactResponse(BaseModel):
     email: EmailStr
     phone_number: str
     birth_date: date
-    additional_data: str = None
+    additional_data: str | None = None
     created_at: datetime
     updated_at: datetime
     user_id: int = Field(1, ge=0)
@@ -34,6 +34,88 @@ class ContactResponse(BaseModel):
         orm_mode = True
 
 
+class ContactCreate(BaseModel):
+    first_name: str
+    last_name: str
+    email: EmailStr
+    phone_number: str
+    birth_date: date
+    additional_data: str | None = None
+
+
+class ContactRowError(BaseModel):
+    row: int
+    detail: str
+
+
+class ContactBulkResult(BaseModel):
+    inserted: int = 0
+    skipped: int = 0
+    errors: List[ContactRowError] = []
+
+
+class ContactFilter(BaseModel):
+    first_name: str | None = None
+    last_name: str | None = None
+    email: EmailStr | None = None
+    birth_date_from: date | None = None
+    birth_date_to: date | None = None
+    created_before: datetime | None = None
+
+    @model_validator(mode="after")
+    def not_empty(self):
+        if all(getattr(self, field) is None for field in self.model_fields):
+            raise ValueError("filter needs at least one condition")
+        return self
+
+
+class ContactSelection(BaseModel):
+    ids: List[int] | None = Field(None, min_length=1, max_length=10000)
+    filter: ContactFilter | None = None
+
+    @model_validator(mode="after")
+    def ids_or_filter(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("give either ids or filter")
+        return self
+
+
+class ContactChanges(BaseModel):
+    first_name: str | None = None
+    last_name: str | None = None
+    phone_number: str | None = None
+    birth_date: date | None = None
+    additional_data: str | None = None
+
+    # Fields may be left out, but only additional_data may be cleared: the others
+    # are required on every contact and last_name is part of the list cursor.
+    @field_validator("first_name", "last_name", "phone_number", "birth_date")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("cannot be null")
+        return value
+
+    @model_validator(mode="after")
+    def not_empty(self):
+        if not self.model_fields_set:
+            raise ValueError("changes need at least one field")
+        return self
+
+
+class ContactBulkUpdate(ContactSelection):
+    changes: ContactChanges
+
+
+class ContactBulkAffected(BaseModel):
+    affected: int
+
+
+class ContactPage(BaseModel):
+    items: List[ContactResponse]
+    next_cursor: str | None = None
+
+
 class UserBase(BaseModel):
     username: str = Field(min_length=3, max_length=15)
     email: EmailStr
@@ -54,6 +136,11 @@ class TokenModel(BaseModel):
     access_token: str
     refresh_token: str
     token_type: str = "bearer"
-    
+
+
+class SessionsRevoked(BaseModel):
+    revoked: int
+
+
 class RequestEmail(BaseModel):
     email: EmailStr
\ No newline at end of file
@@ -1,29 +1,80 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer  # Bearer token
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 
 from src.database.db import get_db
+from src.database.models import User
 from src.repository import users as repository_users
+from src.services.revocations import revocations
+from src.services.user_cache import user_cache
 
 from src.conf.config import settings
 
 
+def _verify_password(plain_password, hashed_password):
+    return Auth.pwd_context.verify(plain_password, hashed_password)
+
+
+def _get_password_hash(password: str):
+    return Auth.pwd_context.hash(password)
+
+
 class Auth:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+    _hash_executor: Executor | None = None
 
     def verify_password(self, plain_password, hashed_password):
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return _verify_password(plain_password, hashed_password)
 
     def get_password_hash(self, password: str):
-        return self.pwd_context.hash(password)
+        return _get_password_hash(password)
+
+    @classmethod
+    def hash_executor(cls) -> Executor:
+        """
+        The hash_executor function returns the bounded pool bcrypt work runs on.
+            bcrypt releases the GIL, so threads hash in parallel; a process pool
+            can be chosen with password_hash_executor = "process".
+
+        :return: The shared executor, sized by settings.password_hash_workers
+        """
+        if cls._hash_executor is None:
+            executor_class = ProcessPoolExecutor if settings.password_hash_executor == "process" else ThreadPoolExecutor
+            cls._hash_executor = executor_class(max_workers=settings.password_hash_workers)
+        return cls._hash_executor
+
+    async def verify_password_async(self, plain_password, hashed_password):
+        """
+        The verify_password_async function checks a password without blocking the event loop.
+
+        :param self: Represent the instance of the class
+        :param plain_password: The password from the login form
+        :param hashed_password: The bcrypt hash stored for the user
+        :return: True if the password matches the hash
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.hash_executor(), _verify_password, plain_password, hashed_password)
+
+    async def get_password_hash_async(self, password: str):
+        """
+        The get_password_hash_async function hashes a password without blocking the event loop.
+
+        :param self: Represent the instance of the class
+        :param password: str: The password to hash
+        :return: The bcrypt hash
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.hash_executor(), _get_password_hash, password)
 
     async def create_access_token(
         self, data: dict, expires_delta: Optional[float] = None
@@ -32,7 +83,7 @@ class Auth:
         The create_access_token function creates a new access token for the user.
             Args:
                 data (dict): The data to be encoded in the JWT. This should include all of the claims that you want to make about this token, including any custom claims that you have defined.
-                expires_delta (Optional[float]): A timedelta object representing how long this token will be valid for before it expires and is no longer usable by clients. If not provided, defaults to 600 minutes (10 hours).
+                expires_delta (Optional[float]): A timedelta object representing how long this token will be valid for before it expires and is no longer usable by clients. If not provided, defaults to settings.access_token_ttl (10 hours).
         
         :param self: Represent the instance of the class
         :param data: dict: Pass the data that will be encoded in the token
@@ -44,7 +95,7 @@ class Auth:
         if expires_delta:
             expire = datetime.utcnow() + timedelta(seconds=expires_delta)
         else:
-            expire = datetime.utcnow() + timedelta(minutes=600)
+            expire = datetime.utcnow() + timedelta(seconds=settings.access_token_ttl)
         to_encode.update(
             {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"}
         )
@@ -59,11 +110,11 @@ class Auth:
         """
         The create_refresh_token function creates a refresh token for the user.
             Args:
-                data (dict): The data to be encoded in the JWT.
-                expires_delta (Optional[float]): The time until expiration of the token, defaults to 7 days if not specified.
+                data (dict): The data to be encoded in the JWT, with the session id from session_store as ``jti``.
+                expires_delta (Optional[float]): The time until expiration of the token, defaults to settings.refresh_token_ttl.
         
         :param self: Represent the instance of the class
-        :param data: dict: Pass in the user's id, username and email
+        :param data: dict: Pass in the user's email and the session id
         :param expires_delta: Optional[float]: Set the expiration time of the token
         :return: A refresh token, which is a jwt
         :doc-author: Trelent
@@ -72,7 +123,7 @@ class Auth:
         if expires_delta:
             expire = datetime.utcnow() + timedelta(seconds=expires_delta)
         else:
-            expire = datetime.utcnow() + timedelta(days=7)
+            expire = datetime.utcnow() + timedelta(seconds=settings.refresh_token_ttl)
         to_encode.update(
             {"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"}
         )
@@ -81,17 +132,77 @@ class Auth:
         )
         return encoded_refresh_token
 
+    @staticmethod
+    def access_claims(user: User) -> dict:
+        """
+        The access_claims function returns the claims of an access token for the user:
+            everything protected routes read from the current user, so the user can be
+            rebuilt from the token alone (see settings.auth_stateless). ``ver`` is the
+            user's token_version when the token is issued. Profile claims are as of
+            issue time; a changed avatar shows in new tokens after the next refresh.
+
+        :param user: User: The user the token is issued to
+        :return: The data to pass to create_access_token
+        """
+        return {
+            "sub": user.email,
+            "uid": user.id,
+            "name": user.username,
+            "avatar": user.avatar,
+            "confirmed": bool(user.confirmed),
+            "ver": user.token_version or 0,
+        }
+
+    @staticmethod
+    def user_from_claims(payload: dict) -> User:
+        """
+        The user_from_claims function rebuilds the current user from access token claims.
+            Like a cached user, it is detached and must not be added to a session.
+
+        :param payload: dict: The decoded access token
+        :return: A User
+        """
+        return User(
+            id=payload["uid"],
+            email=payload["sub"],
+            username=payload.get("name"),
+            avatar=payload.get("avatar"),
+            confirmed=payload.get("confirmed", False),
+            token_version=payload.get("ver", 0),
+        )
+
+    async def load_user(self, email: str, db: AsyncSession) -> User | None:
+        """
+        The load_user function returns the user from user_cache, or from the database on a miss.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email from a token
+        :param db: AsyncSession: Pass the database session to the function
+        :return: A User, detached when it comes from the cache, or None
+        """
+        user = await user_cache.get(email)
+        if user is None:
+            generation = await user_cache.generation(email)
+            user = await repository_users.get_user_by_email(email, db)
+            if user is not None:
+                await user_cache.set(user, generation)
+        return user
+
     async def get_current_user(
-        self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+        self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
     ):
         """
         The get_current_user function is a dependency that will be used in the
             protected endpoints. It takes a token as an argument and returns the user
             object if it's valid, otherwise raises an exception.
+            Users are served from user_cache when possible; a cached user is detached.
+            With settings.auth_stateless the user is rebuilt from the token claims and
+            neither the cache nor the database is read; revoked tokens are caught by
+            the per-process revocation list instead of the stored token_version.
         
         :param self: Represent the instance of a class
         :param token: str: Pass the token to the function
-        :param db: Session: Pass the database session to the function
+        :param db: AsyncSession: Pass the database session to the function
         :return: A user object
         :doc-author: Trelent
         """
@@ -113,30 +224,36 @@ class Auth:
         except JWTError as e:
             raise credentials_exception
 
-        user = await repository_users.get_user_by_email(email, db)
-        if user is None:
+        version = payload.get("ver", 0)
+        if settings.auth_stateless and "uid" in payload:
+            await revocations.sync()
+            if version < revocations.min_version(payload["uid"]):
+                raise credentials_exception
+            return self.user_from_claims(payload)
+
+        user = await self.load_user(email, db)
+        if user is None or version < (user.token_version or 0):
             raise credentials_exception
         return user
 
-    def decode_refresh_token(self, refresh_token: str):
+    def decode_refresh_token(self, refresh_token: str) -> dict:
         """
         The decode_refresh_token function is used to decode the refresh token.
             The function will raise an HTTPException if the token is invalid or has expired.
-            If the token is valid, it will return a string with the email address of 
-            user who owns that refresh_token.
+            If the token is valid, it will return its claims: the email address of the
+            user who owns that refresh_token as ``sub`` and the session id as ``jti``.
         
         :param self: Represent the instance of the class
         :param refresh_token: str: Pass the refresh token to the function
-        :return: The email of the user
+        :return: The claims of the token
         :doc-author: Trelent
         """
         try:
             payload = jwt.decode(
                 refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
             )
-            if payload["scope"] == "refresh_token":
-                email = payload["sub"]
-                return email
+            if payload.get("scope") == "refresh_token" and payload.get("sub") and payload.get("jti"):
+                return payload
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid scope for token",
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import io
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import httpx
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+
+from src.conf.config import settings
+from src.services.cloud_image import CloudImage
+from src.services.local_image import LocalImage
+from src.services.thumbnail_cache import thumbnail_cache
+
+CHUNK_SIZE = 64 * 1024
+# Refuse decompression bombs well before Pillow's own 179 Mpx default.
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+STORAGES = {"cloudinary": CloudImage, "local": LocalImage}
+
+_image_executor: Executor | None = None
+
+
+def image_executor() -> Executor:
+    """
+    The image_executor function returns the process pool avatars are decoded and resized on.
+        Pillow holds the GIL for most of a decode, so threads would still stall the event loop.
+
+    :return: The shared executor, sized by settings.image_workers
+    """
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ProcessPoolExecutor(max_workers=settings.image_workers)
+    return _image_executor
+
+
+def avatar_storage():
+    return STORAGES[settings.avatar_storage]
+
+
+def resize_avatar(data: bytes, size: int) -> bytes:
+    """
+    The resize_avatar function crops an image to a centred square and encodes it as JPEG.
+        It runs in the image process pool.
+
+    :param data: bytes: The uploaded image
+    :param size: int: Width and height of the result
+    :return: The encoded avatar
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # Let the JPEG decoder scale down while decoding instead of materialising every pixel.
+        image.draft("RGB", (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            background = Image.new("RGB", image.size, "white")
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=85, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+async def read_upload(file: UploadFile, limit: int) -> bytes:
+    """
+    The read_upload function reads an upload in chunks and stops as soon as it passes ``limit``.
+
+    :param file: UploadFile: The uploaded file
+    :param limit: int: Maximum size in bytes
+    :return: The file content
+    """
+    if file.size is not None and file.size > limit:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large")
+    data = bytearray()
+    while chunk := await file.read(CHUNK_SIZE):
+        data += chunk
+        if len(data) > limit:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large")
+    return bytes(data)
+
+
+async def store_avatar(file: UploadFile, email: str) -> str:
+    """
+    The store_avatar function turns an upload into a stored 250x250 avatar without blocking the event loop:
+        the image is resized in the process pool and the storage call runs in a worker thread.
+
+    :param file: UploadFile: The uploaded image
+    :param email: str: Email of the owner, used to name the avatar
+    :return: The url of the stored avatar
+    """
+    data = await read_upload(file, settings.avatar_max_bytes)
+    loop = asyncio.get_running_loop()
+    try:
+        image = await loop.run_in_executor(image_executor(), resize_avatar, data, settings.avatar_size)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image")
+    storage = avatar_storage()
+    return await run_in_threadpool(storage.save_avatar, image, storage.generate_name_avatar(email))
+
+
+def thumbnail_key(url: str, size: int) -> str:
+    return hashlib.sha256(f"{url}|{size}".encode("utf-8")).hexdigest()[:32]
+
+
+def _read_local(url: str) -> bytes:
+    root = LocalImage.root.resolve()
+    path = (root / url.split("?")[0][len(LocalImage.base_url):].lstrip("/")).resolve()
+    if not path.is_relative_to(root):
+        raise FileNotFoundError(url)
+    return path.read_bytes()
+
+
+async def fetch_source(url: str) -> bytes:
+    """
+    The fetch_source function loads the original avatar behind a user's avatar url,
+        from the local storage directory or over HTTP, capped at avatar_max_bytes.
+
+    :param url: str: The stored avatar url
+    :return: The image bytes
+    """
+    try:
+        if url.startswith(LocalImage.base_url):
+            return await run_in_threadpool(_read_local, url)
+        async with httpx.AsyncClient(timeout=settings.avatar_fetch_timeout, follow_redirects=True) as client:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                data = bytearray()
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    data += chunk
+                    if len(data) > settings.avatar_max_bytes:
+                        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Avatar is too large")
+                return bytes(data)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Avatar unavailable")
+
+
+async def avatar_thumbnail(url: str, size: int):
+    """
+    The avatar_thumbnail function returns a resized avatar from the thumbnail cache,
+        fetching and resizing the original on a miss.
+
+    :param url: str: The stored avatar url
+    :param size: int: Width and height of the thumbnail
+    :return: The path of the thumbnail
+    """
+
+    async def create():
+        data = await fetch_source(url)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(image_executor(), resize_avatar, data, size)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Invalid avatar image")
+
+    return await thumbnail_cache.get_or_create(thumbnail_key(url, size), create)
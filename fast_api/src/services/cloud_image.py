@@ -1,4 +1,5 @@
 import hashlib
+import io
 
 import cloudinary
 import cloudinary.uploader
@@ -24,6 +25,19 @@ class CloudImage:
         r = cloudinary.uploader.upload(file, public_id=public_id, overwrite=True)
         return r
 
+    @classmethod
+    def save_avatar(cls, image: bytes, public_id: str) -> str:
+        """
+        The save_avatar function uploads an avatar that was already resized locally
+            and returns its url. It blocks on HTTP, so call it off the event loop.
+
+        :param image: bytes: The encoded 250x250 avatar
+        :param public_id: str: Name from generate_name_avatar
+        :return: The url of the uploaded avatar
+        """
+        r = cls.upload(io.BytesIO(image), public_id)
+        return cloudinary.CloudinaryImage(public_id).build_url(version=r.get('version'))
+
     @staticmethod
     def get_url_for_avatar(public_id, r):
         src_url = cloudinary.CloudinaryImage(public_id) \
@@ -0,0 +1,110 @@
+import logging
+import time
+from email.utils import formatdate
+
+from fastapi import Request, Response, status
+from redis.exceptions import RedisError
+
+from src.database.redis import get_redis
+from src.services.page_cache import features_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _key(user_id: int) -> str:
+    return f"contacts:version:{user_id}"
+
+
+# Version bumps this process could not write to Redis, by user id. They are
+# written before its next Redis read; until then that read serves no 304.
+_pending: dict[int, dict] = {}
+
+
+async def _publish_pending() -> None:
+    if not _pending:
+        return
+    pending = dict(_pending)
+    async with get_redis().pipeline(transaction=True) as pipe:
+        for user_id, mapping in pending.items():
+            pipe.hset(_key(user_id), mapping=mapping)
+        await pipe.execute()
+    for user_id, mapping in pending.items():
+        if _pending.get(user_id) is mapping:
+            del _pending[user_id]
+
+
+async def contacts_changed(user_id: int) -> None:
+    """
+    The contacts_changed function records that a user's contacts were written.
+        It gives the user a new contacts version (a nanosecond timestamp, so a lost
+        key never brings back an old ETag) and invalidates the cached /features pages.
+        Repository writers call it after they commit. A version Redis does not take
+        is kept and written again before this process next reads a version.
+
+    :param user_id: int: The owner of the changed contacts
+    """
+    _pending[user_id] = {"version": time.time_ns(), "updated_at": time.time()}
+    try:
+        await _publish_pending()
+    except (RedisError, OSError) as err:
+        logger.warning("Contacts version: Redis unavailable, bump kept for retry (%s)", err)
+    await features_cache.invalidate()
+
+
+async def get_contacts_version(user_id: int) -> tuple | None:
+    """
+    The get_contacts_version function returns the current contacts version of the user.
+        A user without a version yet gets one, so conditional requests work from the
+        first read on. Returns None when Redis is unavailable or a version bump could
+        not be written yet, so callers fail closed and answer in full.
+
+    :param user_id: int: The owner of the contacts
+    :return: A tuple of (version, updated_at as a unix time) or None
+    """
+    try:
+        await _publish_pending()
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hsetnx(_key(user_id), "version", time.time_ns())
+            pipe.hsetnx(_key(user_id), "updated_at", time.time())
+            pipe.hmget(_key(user_id), "version", "updated_at")
+            *_, (version, updated_at) = await pipe.execute()
+    except (RedisError, OSError) as err:
+        logger.warning("Contacts version: Redis unavailable (%s)", err)
+        return None
+    if user_id in _pending:
+        return None
+    return version.decode("ascii"), float(updated_at)
+
+
+async def check_not_modified(request: Request, response: Response, user_id: int, *variant) -> Response | None:
+    """
+    The check_not_modified function handles conditional GETs of a user's contacts.
+        It sets ETag, Last-Modified and Vary on ``response`` and returns a 304 response
+        when If-None-Match already holds the current ETag, so the route can answer
+        without reading or serializing any contacts. ``variant`` is anything besides
+        the version the representation depends on (e.g. today's date).
+
+    :param request: Request: The incoming request
+    :param response: Response: The route's response, gets the validators
+    :param user_id: int: The owner of the contacts
+    :param variant: Extra values the response depends on
+    :return: A 304 response, or None when the route has to build the response
+    """
+    current = await get_contacts_version(user_id)
+    if current is None:
+        return None
+    version, updated_at = current
+    etag = '"' + "-".join(str(part) for part in (user_id, version, *variant)) + '"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(updated_at, usegmt=True),
+        "Vary": "Authorization",
+        "Cache-Control": "private, no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,209 @@
+"""
+Outbox worker: sends the emails queued by the auth routes.
+
+Run it next to the web workers with ``python -m src.services.email_worker``.
+Any number of workers can share the outbox; each claims its own batch.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import aiosmtplib
+from prometheus_client import Counter, start_http_server
+
+from src.conf.config import settings
+from src.database.db import DBSession
+from src.repository import outbox as repository_outbox
+from src.services.emails import build_confirmation_email
+from src.services.metrics import track_task
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 3600
+
+OUTBOX_EMAILS = Counter("outbox_emails_total", "Emails processed by the outbox worker", ["outcome"])
+
+
+def smtp_factory() -> aiosmtplib.SMTP:
+    return aiosmtplib.SMTP(
+        hostname=settings.mail_server,
+        port=settings.mail_port,
+        username=settings.mail_username if settings.mail_use_credentials else None,
+        password=settings.mail_password if settings.mail_use_credentials else None,
+        use_tls=settings.mail_ssl_tls,
+        start_tls=settings.mail_starttls,
+        timeout=settings.smtp_timeout,
+    )
+
+
+class SMTPPool:
+    def __init__(self, size: int = settings.smtp_pool_size, factory=smtp_factory):
+        """
+        The SMTPPool keeps up to ``size`` authenticated SMTP connections open between batches,
+            so the TLS handshake and login are paid once per connection instead of once per email.
+
+        :param size: int: Maximum number of concurrent connections
+        :param factory: Callable returning a new, not yet connected aiosmtplib.SMTP
+        """
+        self.size = size
+        self.factory = factory
+        self._idle = asyncio.Queue()
+        self._slots = asyncio.Semaphore(size)
+        self.connects = 0
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._slots:
+            smtp = self._idle.get_nowait() if not self._idle.empty() else self.factory()
+            try:
+                if not smtp.is_connected:
+                    await smtp.connect()
+                    self.connects += 1
+                yield smtp
+            except aiosmtplib.SMTPServerDisconnected:
+                smtp.close()
+                raise
+            except BaseException:
+                # The session may be mid-transaction; reset it before reuse.
+                if smtp.is_connected:
+                    try:
+                        await smtp.rset()
+                    except (aiosmtplib.SMTPException, OSError):
+                        smtp.close()
+                raise
+            finally:
+                self._idle.put_nowait(smtp)
+
+    async def send_message(self, message) -> None:
+        """
+        The send_message function sends one email over a pooled connection.
+            A pooled connection the server closed while it sat idle still looks connected
+            until it is used, so when the send finds it closed, the connection is opened
+            again and the email sent once more before the failure counts.
+
+        :param message: EmailMessage: The email to send
+        """
+        async with self.connection() as smtp:
+            try:
+                await smtp.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                smtp.close()
+                await smtp.connect()
+                self.connects += 1
+                await smtp.send_message(message)
+
+    async def close(self):
+        while not self._idle.empty():
+            smtp = self._idle.get_nowait()
+            if smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except (aiosmtplib.SMTPException, OSError):
+                    smtp.close()
+
+
+@dataclass
+class WorkerStats:
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    batches: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+
+class OutboxWorker:
+    def __init__(self, session_factory=DBSession, pool: SMTPPool | None = None,
+                 batch_size: int = settings.outbox_batch_size,
+                 max_attempts: int = settings.outbox_max_attempts,
+                 retry_base: float = settings.outbox_retry_base,
+                 lease: float = settings.outbox_lease,
+                 poll_interval: float = settings.outbox_poll_interval):
+        self.session_factory = session_factory
+        self.pool = pool or SMTPPool()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.lease = timedelta(seconds=lease)
+        self.poll_interval = poll_interval
+        self.stats = WorkerStats()
+
+    def retry_delay(self, attempts: int) -> timedelta | None:
+        """
+        The retry_delay function returns the exponential backoff after ``attempts`` failed sends,
+            or None once the email has used up its attempts.
+
+        :param attempts: int: Failed attempts so far, including the current one
+        :return: The delay before the next attempt, or None to give up
+        """
+        if attempts >= self.max_attempts:
+            return None
+        return timedelta(seconds=min(self.retry_base * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+    async def _send(self, message) -> str | None:
+        try:
+            email = build_confirmation_email(message.recipient, message.username, message.host)
+            await self.pool.send_message(email)
+        except (aiosmtplib.SMTPException, OSError) as err:
+            return str(err) or err.__class__.__name__
+        return None
+
+    async def run_once(self) -> int:
+        """
+        The run_once function claims one batch of due emails and sends it over the pooled connections.
+
+        :return: The number of emails claimed
+        """
+        async with self.session_factory() as db:
+            batch = await repository_outbox.claim_batch(db, self.batch_size, self.lease)
+            if not batch:
+                return 0
+            started = time.monotonic()
+            async with track_task("outbox_batch"):
+                errors = await asyncio.gather(*(self._send(message) for message in batch))
+                await repository_outbox.mark_sent([m.id for m, err in zip(batch, errors) if err is None], db)
+                for message, err in zip(batch, errors):
+                    if err is None:
+                        continue
+                    retry_in = self.retry_delay(message.attempts + 1)
+                    await repository_outbox.mark_failed(message, err, retry_in, db)
+                    if retry_in is None:
+                        self.stats.failed += 1
+                        OUTBOX_EMAILS.labels("failed").inc()
+                        logger.error("Giving up on email %s to %s: %s", message.id, message.recipient, err)
+                    else:
+                        self.stats.retried += 1
+                        OUTBOX_EMAILS.labels("retried").inc()
+        sent = errors.count(None)
+        self.stats.sent += sent
+        OUTBOX_EMAILS.labels("sent").inc(sent)
+        self.stats.batches += 1
+        logger.info("Outbox batch: %d sent, %d failed in %.3fs (%.1f emails/s overall)",
+                    sent, len(batch) - sent, time.monotonic() - started, self.stats.throughput)
+        return len(batch)
+
+    async def run_forever(self, stop: asyncio.Event | None = None):
+        stop = stop or asyncio.Event()
+        try:
+            while not stop.is_set():
+                if await self.run_once() < self.batch_size:
+                    try:
+                        await asyncio.wait_for(stop.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            await self.pool.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if settings.outbox_metrics_port:
+        start_http_server(settings.outbox_metrics_port)
+    asyncio.run(OutboxWorker().run_forever())
@@ -1,53 +1,30 @@
+from email.message import EmailMessage
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
-from pydantic import EmailStr
+from jinja2 import Environment, FileSystemLoader
 
 from src.services.auth import auth_service
 from src.conf.config import settings
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM = settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="Contacts app",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+templates = Environment(loader=FileSystemLoader(Path(__file__).parent / 'templates'), autoescape=True)
 
 
-async def send_email(email: EmailStr, username: str, host: str):
+def build_confirmation_email(email: str, username: str, host: str) -> EmailMessage:
     """
-    The send_email function sends an email to the user with a link to confirm their email address.
-        The function takes in three arguments:
-            -email: the user's email address, which is used as a unique identifier for them.
-            -username: the username of the user who is trying to sign up. This will be displayed in 
-                their confirmation message so they know it was sent by us and not some random person 
-                trying to phish them for information. It also helps make sure that we're sending this 
-                message only when someone signs up, and not at any other time (like when they
-    
-    :param email: EmailStr: Validate the email address
+    The build_confirmation_email function renders the confirmation email without sending it.
+        The outbox worker uses it to send many messages over one SMTP connection,
+        with a fresh token rendered at send time.
+
+    :param email: str: The recipient
     :param username: str: Pass the username to the template
     :param host: str: Pass the hostname of the web application to the email template
-    :return: A coroutine object
-    :doc-author: Trelent
+    :return: A ready to send EmailMessage
     """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
\ No newline at end of file
+    token_verification = auth_service.create_email_token({"sub": email})
+    body = templates.get_template("email_template.html").render(host=host, username=username, token=token_verification)
+    message = EmailMessage()
+    message["Subject"] = "Confirm your email"
+    message["From"] = f"Contacts app <{settings.mail_from}>"
+    message["To"] = email
+    message.set_content(body, subtype="html")
+    return message
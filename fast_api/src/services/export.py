@@ -0,0 +1,65 @@
+import csv
+import io
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+
+def row_dicts(rows, columns: tuple) -> list:
+    """
+    The row_dicts function turns database rows into JSON-ready dicts.
+        Rows come from our own tables, so they are not validated again on the way out.
+
+    :param rows: Iterable of row tuples
+    :param columns: tuple: Names of the row columns, used as keys
+    :return: A list of dicts
+    """
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def json_response(content, response: Response | None = None) -> ORJSONResponse:
+    """
+    The json_response function encodes ``content`` with orjson, skipping FastAPI's
+        response_model validation. Headers already set on the route's ``response``
+        parameter (ETag and friends) are carried over.
+
+    :param content: Anything orjson can encode
+    :param response: Response | None: The Response parameter of the route
+    :return: The response to return from the route
+    """
+    headers = None
+    if response is not None:
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return ORJSONResponse(content, headers=headers)
+
+
+async def ndjson_chunks(partitions, columns: tuple):
+    """
+    The ndjson_chunks function encodes row partitions as newline-delimited JSON.
+
+    :param partitions: An async iterator of row lists
+    :param columns: tuple: Names of the row columns, used as JSON keys
+    :return: An async iterator of encoded chunks, one per partition
+    """
+    async for rows in partitions:
+        yield b"".join(orjson.dumps(dict(zip(columns, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+async def csv_chunks(partitions, columns: tuple):
+    """
+    The csv_chunks function encodes row partitions as CSV, header first.
+
+    :param partitions: An async iterator of row lists
+    :param columns: tuple: Names of the row columns, written as the header
+    :return: An async iterator of encoded chunks, one per partition
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
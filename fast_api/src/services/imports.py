@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from typing import List
+
+from pydantic import TypeAdapter, ValidationError
+
+from src.schemas import ContactCreate
+
+contact_adapter = TypeAdapter(ContactCreate)
+contacts_adapter = TypeAdapter(List[ContactCreate])
+
+
+class RowError(Exception):
+    def __init__(self, row: int, detail: str):
+        super().__init__(detail)
+        self.row = row
+        self.detail = detail
+
+
+def _describe(err: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in err.errors())
+
+
+def parse_rows(body: bytes, content_type: str) -> list:
+    """
+    The parse_rows function splits an upload into raw rows.
+        JSON bodies must be an array of objects, ``application/x-ndjson`` has one
+        object per line and ``text/csv`` has a header line with the field names.
+        A line that cannot be parsed becomes a RowError in place of its row.
+
+    :param body: bytes: The request body
+    :param content_type: str: The request Content-Type
+    :return: A list of dicts and RowErrors, in upload order
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    text = body.decode("utf-8-sig")
+    if media_type == "text/csv":
+        return [
+            {key: value or None for key, value in row.items() if key}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    if media_type == "application/x-ndjson":
+        rows = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as err:
+                rows.append(RowError(len(rows), f"Invalid JSON: {err}"))
+        return rows
+    rows = json.loads(text)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of contacts")
+    return rows
+
+
+def validate_rows(rows: list, offset: int = 0) -> tuple:
+    """
+    The validate_rows function validates a batch of raw rows.
+        The whole batch goes through one TypeAdapter call first; only a batch
+        that fails is validated again row by row to tell good rows from bad ones.
+
+    :param rows: list: Raw rows, as returned by parse_rows
+    :param offset: int: Index of the first row in the upload, used in errors
+    :return: A tuple of ((index, row dict) pairs for the valid rows, RowErrors)
+    """
+    if not any(isinstance(row, RowError) for row in rows):
+        try:
+            contacts = contacts_adapter.validate_python(rows)
+            return [(index, contact.model_dump()) for index, contact in enumerate(contacts, start=offset)], []
+        except ValidationError:
+            pass
+    valid, errors = [], []
+    for index, row in enumerate(rows, start=offset):
+        if isinstance(row, RowError):
+            errors.append(RowError(index, row.detail))
+            continue
+        try:
+            valid.append((index, contact_adapter.validate_python(row).model_dump()))
+        except ValidationError as err:
+            errors.append(RowError(index, _describe(err)))
+    return valid, errors
@@ -0,0 +1,49 @@
+from fastapi import Request
+from jose import JWTError, jwt
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from src.conf.config import settings
+
+
+def rate_limit_key(request: Request) -> str:
+    """
+    The rate_limit_key function picks the bucket a request is counted in.
+        Requests with a valid access token are counted per user (the JWT ``sub``),
+        so users behind one NAT do not share a budget; everything else per client IP.
+        The token signature is checked, so a forged ``sub`` cannot spend someone else's budget.
+
+    :param request: Request: The incoming request
+    :return: ``user:<email>`` or the remote address
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        except JWTError:
+            payload = {}
+        if payload.get("scope") == "access_token" and payload.get("sub"):
+            return f"user:{payload['sub']}"
+    return get_remote_address(request)
+
+
+def storage_uri() -> str:
+    return settings.rate_limit_storage_uri or f"redis://{settings.redis_host}:{settings.redis_port}"
+
+
+def default_limits() -> list[str]:
+    # Opt-in: when set, it also applies to every route that declares no limit of its own.
+    return [settings.rate_limit_default] if settings.rate_limit_default else []
+
+
+# "moving-window" on Redis is a sliding log kept in one list per key and checked
+# by a Lua script, so each hit is a single atomic round trip shared by all workers.
+limiter = Limiter(
+    key_func=rate_limit_key,
+    default_limits=default_limits(),
+    storage_uri=storage_uri(),
+    strategy="moving-window",
+    in_memory_fallback_enabled=True,
+    key_prefix="ratelimit",
+    enabled=settings.rate_limit_enabled,
+)
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from src.conf.config import settings
+
+
+class LocalImage:
+    """
+    Avatar storage on the local filesystem, served by the app's /static mount.
+    It has the same interface as CloudImage, so it can replace it in development and tests.
+    """
+    root = Path(settings.avatar_local_dir)
+    base_url = settings.avatar_local_url
+
+    @staticmethod
+    def generate_name_avatar(email: str):
+        name = hashlib.sha256(email.encode('utf-8')).hexdigest()[:12]
+        return f"Avatar_folder/{name}"
+
+    @classmethod
+    def save_avatar(cls, image: bytes, public_id: str) -> str:
+        """
+        The save_avatar function writes an already resized avatar and returns its url.
+            The file is replaced atomically, and the url carries a content hash so
+            clients and proxies never see a stale image under a cached url.
+
+        :param image: bytes: The encoded avatar
+        :param public_id: str: Name from generate_name_avatar
+        :return: The url of the stored avatar
+        """
+        path = cls.root / f"{public_id}.jpg"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(image)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        version = hashlib.sha256(image).hexdigest()[:12]
+        return f"{cls.base_url.rstrip('/')}/{public_id}.jpg?v={version}"
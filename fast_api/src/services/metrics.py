@@ -0,0 +1,176 @@
+"""
+Prometheus metrics for the API.
+
+Request metrics are recorded by MetricsMiddleware, a plain ASGI middleware,
+and SQL metrics by engine events. Both only touch pre-resolved label children
+and a context variable on the hot path; pool statistics are read at scrape time.
+With several worker processes set PROMETHEUS_MULTIPROC_DIR so /metrics
+aggregates all of them.
+"""
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from fastapi import Request
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.database.pool import pool_stats
+
+UNMATCHED = "<unmatched>"
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being handled", ["method"], multiprocess_mode="livesum"
+)
+QUERY_DURATION = Histogram("db_query_duration_seconds", "Duration of single SQL statements")
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request", ["route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_QUERY_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL statements per request", ["route"]
+)
+BACKGROUND_TASKS = Counter("background_tasks_total", "Finished background tasks", ["task", "outcome"])
+BACKGROUND_TASKS_IN_PROGRESS = Gauge(
+    "background_tasks_in_progress", "Running background tasks", ["task"], multiprocess_mode="livesum"
+)
+RATE_LIMIT_REJECTIONS = Counter("rate_limit_rejections_total", "Requests rejected by the rate limiter", ["route"])
+
+# [statement count, seconds in SQL] of the request being handled, or None outside requests.
+_request_queries: ContextVar[list | None] = ContextVar("request_queries", default=None)
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED)
+
+
+class MetricsMiddleware:
+    """
+    Records latency by method, route template and status, requests in flight,
+    and the SQL statements each request ran.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        status = 500
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            _request_queries.reset(token)
+            route = route_label(scope)
+            REQUEST_DURATION.labels(method, route, str(status)).observe(duration)
+            REQUEST_QUERIES.labels(route).observe(queries[0])
+            REQUEST_QUERY_DURATION.labels(route).observe(queries[1])
+
+
+def install_query_metrics(engine: Engine) -> None:
+    """
+    The install_query_metrics function times every SQL statement on ``engine``
+        and adds it to the statement count and SQL time of the current request.
+
+    :param engine: Engine: The sync engine (``AsyncEngine.sync_engine``) to hook
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["metrics_start_time"].pop()
+        QUERY_DURATION.observe(duration)
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+            queries[1] += duration
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("metrics_start_time"):
+            context.connection.info["metrics_start_time"].pop()
+
+
+class PoolCollector:
+    """
+    Exposes pool_stats at scrape time, so checkouts pay nothing for it.
+    """
+
+    def collect(self):
+        snapshot = pool_stats.snapshot()
+        for name in ("size", "checked_out", "checked_in", "overflow"):
+            yield GaugeMetricFamily(f"db_pool_{name}", f"Connection pool {name.replace('_', ' ')}",
+                                    value=snapshot[name])
+        wait = snapshot["wait_seconds"]
+        cumulative, buckets = 0, []
+        for bound, count in wait["buckets"].items():
+            cumulative += count
+            buckets.append((bound, cumulative))
+        yield HistogramMetricFamily("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+                                    buckets=buckets, sum_value=wait["sum"])
+
+
+REGISTRY.register(PoolCollector())
+
+
+@asynccontextmanager
+async def track_task(name: str):
+    """
+    The track_task function counts a background task while it runs and once it finishes.
+
+    :param name: str: The task label
+    """
+    in_progress = BACKGROUND_TASKS_IN_PROGRESS.labels(name)
+    in_progress.inc()
+    try:
+        yield
+    except BaseException:
+        BACKGROUND_TASKS.labels(name, "error").inc()
+        raise
+    else:
+        BACKGROUND_TASKS.labels(name, "ok").inc()
+    finally:
+        in_progress.dec()
+
+
+def metrics_response(request: Request) -> Response:
+    """
+    The metrics_response function renders all metrics in the Prometheus text format.
+
+    :param request: Request: The scrape request
+    :return: The metrics response
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        registry.register(PoolCollector())
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
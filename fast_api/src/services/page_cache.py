@@ -0,0 +1,48 @@
+import logging
+
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.database.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class PageCache:
+    """
+    Rendered HTML fragments in Redis, keyed by a version counter.
+
+    Writers call invalidate(), which bumps the version; entries of older versions
+    are never read again and expire with their TTL. Any Redis error makes the
+    cache a miss, so pages are rendered from the database instead.
+    """
+
+    def __init__(self, prefix: str, ttl: int):
+        self.prefix = prefix
+        self.ttl = ttl
+
+    async def _version(self) -> int:
+        return int(await get_redis().get(f"{self.prefix}:version") or 0)
+
+    async def get(self, key: str) -> str | None:
+        try:
+            html = await get_redis().get(f"{self.prefix}:{await self._version()}:{key}")
+        except (RedisError, OSError) as err:
+            logger.warning("Page cache %s: Redis unavailable (%s)", self.prefix, err)
+            return None
+        return html.decode("utf-8") if html is not None else None
+
+    async def set(self, key: str, html: str) -> None:
+        try:
+            await get_redis().set(f"{self.prefix}:{await self._version()}:{key}", html, ex=self.ttl)
+        except (RedisError, OSError) as err:
+            logger.warning("Page cache %s: Redis unavailable (%s)", self.prefix, err)
+
+    async def invalidate(self) -> None:
+        try:
+            await get_redis().incr(f"{self.prefix}:version")
+        except (RedisError, OSError) as err:
+            logger.warning("Page cache %s: Redis unavailable (%s)", self.prefix, err)
+
+
+features_cache = PageCache("features", settings.features_cache_ttl)
@@ -0,0 +1,35 @@
+import base64
+import json
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(*values) -> str:
+    """
+    The encode_cursor function packs the sort key of the last row into an opaque cursor.
+
+    :param values: The sort key values, e.g. ``last_name, id``
+    :return: A url-safe cursor string
+    """
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, types: tuple) -> tuple:
+    """
+    The decode_cursor function unpacks a cursor made by encode_cursor.
+        A cursor that was tampered with or has the wrong shape is a client error.
+
+    :param cursor: str: The cursor from the query string
+    :param types: tuple: The expected type of each sort key value
+    :return: The sort key as a tuple
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types) \
+            or not all(isinstance(value, kind) for value, kind in zip(values, types)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return tuple(values)
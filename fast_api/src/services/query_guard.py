@@ -0,0 +1,149 @@
+"""
+Development and staging guard against chatty request handlers.
+
+While enabled, every SQL statement a request runs is recorded through engine
+events. After the response, QueryGuardMiddleware logs statements repeated with
+different parameters (the N+1 pattern, e.g. a lazy ``Contact.user`` load per
+row) together with the call site that issued them, and checks the statement
+count against the route's budget. With ``query_guard_raise`` set, as in the
+test suite, a blown budget raises QueryBudgetExceeded instead of only logging.
+"""
+import logging
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.conf.config import settings
+from src.services.metrics import route_label
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = str(Path(__file__).resolve().parents[2])
+_NO_BUDGET = object()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryTracker:
+    """
+    Statements executed in one request, with the call site of each repeated one.
+    """
+
+    def __init__(self, repeat_threshold: int = settings.query_guard_repeat_threshold):
+        self.repeat_threshold = repeat_threshold
+        self.statements = Counter()
+        self.call_sites = {}
+
+    @property
+    def total(self) -> int:
+        return sum(self.statements.values())
+
+    def record(self, statement: str) -> None:
+        self.statements[statement] += 1
+        # Only pay for a stack walk once a statement starts to look like N+1.
+        if self.statements[statement] == self.repeat_threshold:
+            self.call_sites[statement] = call_site()
+
+    def repeated(self) -> list:
+        return [(statement, count) for statement, count in self.statements.most_common()
+                if count >= self.repeat_threshold]
+
+
+def call_site() -> str:
+    """
+    The call_site function formats the project frames of the current stack,
+        skipping SQLAlchemy, the drivers and this module.
+
+    :return: The stack, innermost frame last
+    """
+    frames = [frame for frame in traceback.extract_stack()
+              if frame.filename.startswith(PROJECT_ROOT) and frame.filename != __file__
+              and "site-packages" not in frame.filename]
+    return "".join(traceback.format_list(frames))
+
+
+_tracker: ContextVar[QueryTracker | None] = ContextVar("query_tracker", default=None)
+
+
+def install_query_guard(engine: Engine) -> None:
+    """
+    The install_query_guard function records the statements ``engine`` runs into the current tracker.
+
+    :param engine: Engine: The sync engine (``AsyncEngine.sync_engine``) to hook
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        tracker = _tracker.get()
+        if tracker is not None:
+            tracker.record(statement)
+
+
+@contextmanager
+def track_queries(repeat_threshold: int = settings.query_guard_repeat_threshold):
+    """
+    The track_queries function records the statements run inside the block, for tests
+        outside the request cycle.
+
+    :param repeat_threshold: int: Executions after which a statement counts as repeated
+    :return: The QueryTracker of the block
+    """
+    tracker = QueryTracker(repeat_threshold)
+    token = _tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+
+
+def query_budget(max_queries: int | None):
+    """
+    The query_budget function sets the statement budget of a route; None lifts the limit,
+        for routes such as bulk imports whose statement count grows with the input.
+        Apply it below the router decorator.
+
+    :param max_queries: int | None: Maximum statements per request
+    :return: A decorator recording the budget on the endpoint
+    """
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+def route_budget(scope) -> int | None:
+    endpoint = getattr(scope.get("route"), "endpoint", None)
+    budget = getattr(endpoint, "query_budget", _NO_BUDGET)
+    return settings.query_guard_default_budget if budget is _NO_BUDGET else budget
+
+
+class QueryGuardMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        tracker = QueryTracker()
+        token = _tracker.set(tracker)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _tracker.reset(token)
+        route = f"{scope['method']} {route_label(scope)}"
+        for statement, count in tracker.repeated():
+            logger.warning("Possible N+1 in %s: statement ran %d times\n%s\nIssued from:\n%s",
+                           route, count, statement, tracker.call_sites.get(statement, ""))
+        budget = route_budget(scope)
+        if budget is not None and tracker.total > budget:
+            message = f"{route} ran {tracker.total} SQL statements, budget is {budget}"
+            if settings.query_guard_raise:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
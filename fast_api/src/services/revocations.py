@@ -0,0 +1,87 @@
+import logging
+import time
+
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.database.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY = "auth:revocations"
+
+
+class RevocationList:
+    """
+    Per-process copy of the revoked access-token versions, synced from Redis.
+
+    Revoking a user's tokens bumps users.token_version; every access token signed
+    with a lower ``ver`` claim is then refused. Redis keeps one ``{user_id}:{version}``
+    member per revocation in a sorted set scored by when the last token it covers
+    expires, so the set only holds users revoked within one access-token lifetime.
+    Each process mirrors it as a dict of user id to minimum valid version and
+    reloads it at most every ``sync_interval`` seconds, so a revocation made by
+    another worker applies there after that delay; the revoking process applies it at once.
+    When Redis is unreachable the last copy stays in use, and revocations that could
+    not be published are kept locally and published on a later sync.
+    """
+
+    def __init__(self, sync_interval: float, token_ttl: int):
+        self.sync_interval = sync_interval
+        self.token_ttl = token_ttl
+        self._min_versions: dict[int, int] = {}
+        self._unpublished: dict[str, float] = {}
+        self._synced_at = float("-inf")
+
+    def min_version(self, user_id: int) -> int:
+        return self._min_versions.get(user_id, 0)
+
+    def _apply(self, user_id: int, version: int) -> None:
+        self._min_versions[user_id] = max(version, self.min_version(user_id))
+
+    async def revoke(self, user_id: int, version: int) -> None:
+        """
+        The revoke function refuses the user's access tokens older than ``version``.
+
+        :param user_id: int: The user whose tokens are revoked
+        :param version: int: The user's new token_version
+        """
+        self._apply(user_id, version)
+        member = {f"{user_id}:{version}": time.time() + self.token_ttl}
+        try:
+            await get_redis().zadd(KEY, member)
+        except (RedisError, OSError) as err:
+            logger.warning("Revocations: Redis unavailable, revocation of user %s is local for now (%s)", user_id, err)
+            self._unpublished.update(member)
+
+    async def sync(self) -> None:
+        """
+        The sync function reloads the revocations from Redis once ``sync_interval`` has passed.
+        """
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                if self._unpublished:
+                    pipe.zadd(KEY, self._unpublished)
+                pipe.zremrangebyscore(KEY, "-inf", time.time())
+                pipe.zrange(KEY, 0, -1)
+                *_, members = await pipe.execute()
+        except (RedisError, OSError) as err:
+            logger.warning("Revocations: Redis unavailable, keeping the last copy (%s)", err)
+            return
+        self._unpublished.clear()
+        self._min_versions = {}
+        for member in members:
+            user_id, version = map(int, member.split(b":"))
+            self._apply(user_id, version)
+
+    def clear(self) -> None:
+        self._min_versions.clear()
+        self._unpublished.clear()
+        self._synced_at = float("-inf")
+
+
+revocations = RevocationList(settings.revocation_sync_interval, settings.access_token_ttl)
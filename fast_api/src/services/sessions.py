@@ -0,0 +1,122 @@
+import json
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.database.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Refresh-token sessions kept in Redis, one key per token id (the ``jti`` claim).
+
+    ``session:{jti}`` holds the owner and expires with the refresh token, so checking,
+    rotating or revoking a session is one key operation. ``sessions:{email}`` is a
+    sorted set of the user's token ids scored by expiry, used to log out everywhere;
+    expired ids are pruned from it whenever a session is added.
+    The users table is never written: logins and refreshes cost no row updates,
+    and a user may hold any number of sessions, one per device.
+    Unlike the caches, Redis is the store of record here: when it is unreachable
+    the auth routes answer 503 instead of falling back.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(jti: str) -> str:
+        return f"session:{jti}"
+
+    @staticmethod
+    def _user_key(email: str) -> str:
+        return f"sessions:{email}"
+
+    @asynccontextmanager
+    async def _redis(self):
+        try:
+            yield get_redis()
+        except (RedisError, OSError) as err:
+            logger.warning("Session store: Redis unavailable (%s)", err)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Session store unavailable")
+
+    async def create(self, email: str, device: str | None = None) -> str:
+        """
+        The create function opens a new session for the user.
+
+        :param email: str: The owner of the session
+        :param device: str | None: The client's User-Agent, kept for reference
+        :return: The token id to put in the refresh token as ``jti``
+        """
+        jti = uuid.uuid4().hex
+        now = time.time()
+        value = json.dumps({"email": email, "device": device, "created_at": int(now)})
+        async with self._redis() as redis:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.set(self._key(jti), value, ex=self.ttl)
+                pipe.zremrangebyscore(self._user_key(email), "-inf", now)
+                pipe.zadd(self._user_key(email), {jti: now + self.ttl})
+                pipe.expire(self._user_key(email), self.ttl)
+                await pipe.execute()
+        return jti
+
+    async def pop(self, jti: str, email: str) -> bool:
+        """
+        The pop function ends a session and tells whether it was still open.
+            GETDEL makes it atomic: of two requests presenting the same refresh token,
+            only one sees the session.
+
+        :param jti: str: The token id
+        :param email: str: The owner, from the token subject
+        :return: True if the session existed
+        """
+        async with self._redis() as redis:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.getdel(self._key(jti))
+                pipe.zrem(self._user_key(email), jti)
+                value, _ = await pipe.execute()
+        return value is not None
+
+    async def rotate(self, jti: str, email: str, device: str | None = None) -> str | None:
+        """
+        The rotate function replaces a session with a new one, as on every token refresh.
+
+        :param jti: str: The token id of the refresh token presented
+        :param email: str: The owner, from the token subject
+        :param device: str | None: The client's User-Agent
+        :return: The new token id, or None if the session was not open (revoked, expired or already rotated)
+        """
+        if not await self.pop(jti, email):
+            return None
+        return await self.create(email, device)
+
+    async def revoke_all(self, email: str) -> int:
+        """
+        The revoke_all function ends every session of the user ("log out everywhere").
+
+        :param email: str: The owner of the sessions
+        :return: The number of sessions that were open
+        """
+        async with self._redis() as redis:
+            jtis = await redis.zrange(self._user_key(email), 0, -1)
+            if not jtis:
+                return 0
+            keys = [self._key(jti.decode() if isinstance(jti, bytes) else jti) for jti in jtis]
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.delete(*keys)
+                pipe.delete(self._user_key(email))
+                revoked, _ = await pipe.execute()
+        return revoked
+
+    async def count(self, email: str) -> int:
+        async with self._redis() as redis:
+            return await redis.zcount(self._user_key(email), time.time(), "+inf")
+
+
+session_store = SessionStore(ttl=settings.refresh_token_ttl)
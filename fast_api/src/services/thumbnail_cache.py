@@ -0,0 +1,130 @@
+import asyncio
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+from src.conf.config import settings
+
+SUFFIX = ".jpg"
+
+
+class ThumbnailCache:
+    """
+    Encoded thumbnails on local disk, evicted least recently used first once
+    their total size passes ``max_bytes``.
+
+    Files are named by key, so the cache survives restarts: the index is rebuilt
+    from the directory on first use, ordered by modification time, and a hit
+    touches the file to keep that order. Misses for the same key are computed once.
+
+    The index and the byte budget belong to one process. Workers sharing
+    ``root`` each enforce ``max_bytes`` on the files they know about, so the
+    directory can grow to about the number of workers times ``max_bytes``;
+    size avatar_cache_max_bytes with that in mind.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._index: OrderedDict[str, int] | None = None
+        self._size = 0
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _scan(self) -> list[tuple[float, str, int]]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in self.root.glob(f"*{SUFFIX}"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        return sorted(entries)
+
+    async def _load(self) -> OrderedDict:
+        if self._index is None:
+            entries = await asyncio.to_thread(self._scan)
+            if self._index is None:
+                self._index = OrderedDict((key, size) for _, key, size in entries)
+                self._size = sum(self._index.values())
+        return self._index
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}{SUFFIX}"
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    async def get(self, key: str) -> Path | None:
+        """
+        The get function returns the path of a cached thumbnail and marks it as recently used.
+
+        :param key: str: The thumbnail key
+        :return: The path, or None on a miss
+        """
+        index = await self._load()
+        if key not in index:
+            return None
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._size -= index.pop(key)
+            return None
+        index.move_to_end(key)
+        return path
+
+    def _write(self, key: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    async def put(self, key: str, data: bytes) -> Path:
+        """
+        The put function stores a thumbnail and evicts the least recently used ones over the byte budget.
+
+        :param key: str: The thumbnail key
+        :param data: bytes: The encoded thumbnail
+        :return: The path of the stored thumbnail
+        """
+        index = await self._load()
+        await run_in_threadpool(self._write, key, data)
+        self._size += len(data) - index.pop(key, 0)
+        index[key] = len(data)
+        while self._size > self.max_bytes and len(index) > 1:
+            old, size = index.popitem(last=False)
+            self._size -= size
+            self.path(old).unlink(missing_ok=True)
+        return self.path(key)
+
+    async def get_or_create(self, key: str, create) -> Path:
+        """
+        The get_or_create function returns a cached thumbnail, building it with ``create`` on a miss.
+            Concurrent misses for one key wait for a single ``create`` call.
+
+        :param key: str: The thumbnail key
+        :param create: Coroutine function returning the encoded thumbnail
+        :return: The path of the thumbnail
+        """
+        path = await self.get(key)
+        if path is not None:
+            return path
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                path = await self.get(key)
+                if path is None:
+                    path = await self.put(key, await create())
+                return path
+        finally:
+            if not lock.locked():
+                self._locks.pop(key, None)
+
+
+thumbnail_cache = ThumbnailCache(settings.avatar_cache_dir, settings.avatar_cache_max_bytes)
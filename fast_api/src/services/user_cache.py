@@ -0,0 +1,179 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from redis.exceptions import RedisError, WatchError
+
+from src.conf.config import settings
+from src.database.models import User
+from src.database.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Secrets stay in the database: the cached user is only what protected routes read.
+CACHED_FIELDS = ("id", "username", "email", "avatar", "confirmed", "token_version")
+# The generation of a user whose L2 generation could not be read: never stored in L2.
+UNKNOWN = object()
+
+
+class UserCache:
+    """
+    Two-level cache of authenticated users keyed by email.
+
+    L1 is a small per-process LRU with a short TTL, L2 is Redis with a longer one.
+    Writers invalidate both explicitly; other workers' L1 entries expire on their own,
+    so a change is visible everywhere after at most ``l1_ttl`` seconds.
+    When Redis is unreachable it is skipped for ``retry_after`` seconds and lookups
+    fall through to the database. Invalidations are the exception: they always try
+    Redis, and the ones that fail are retried before Redis is read again, so a stale
+    L2 entry (e.g. an old token_version) is never served after Redis recovers.
+
+    Filling the cache after a miss is conditional, so a user read from the database
+    just before a concurrent write cannot be cached over that write's invalidation:
+    call ``generation`` before the database read and pass its result to ``set``.
+    Every invalidation bumps a per-email counter in Redis (and a per-process one),
+    and ``set`` stores nothing if either moved in between.
+    """
+
+    def __init__(self, ttl: int, l1_ttl: float, l1_size: int, retry_after: float = 5.0):
+        self.ttl = ttl
+        self.l1_ttl = l1_ttl
+        self.l1_size = l1_size
+        self.retry_after = retry_after
+        self._l1: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._redis_down_until = 0.0
+        self._stale: set[str] = set()
+        self._invalidations = 0
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return f"user:{email}"
+
+    @staticmethod
+    def _generation_key(email: str) -> str:
+        return f"user:generation:{email}"
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, err: Exception) -> None:
+        logger.warning("User cache: Redis unavailable, using the database (%s)", err)
+        self._redis_down_until = time.monotonic() + self.retry_after
+
+    async def _flush_invalidations(self) -> None:
+        if self._stale:
+            emails = list(self._stale)
+            async with get_redis().pipeline(transaction=True) as pipe:
+                for email in emails:
+                    pipe.delete(self._key(email))
+                    pipe.incr(self._generation_key(email))
+                    pipe.expire(self._generation_key(email), self.ttl)
+                await pipe.execute()
+            self._stale.difference_update(emails)
+
+    def _l1_get(self, email: str) -> dict | None:
+        entry = self._l1.get(email)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self._l1[email]
+            return None
+        self._l1.move_to_end(email)
+        return data
+
+    def _l1_set(self, email: str, data: dict) -> None:
+        self._l1[email] = (time.monotonic() + self.l1_ttl, data)
+        self._l1.move_to_end(email)
+        while len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
+
+    async def get(self, email: str) -> User | None:
+        """
+        The get function returns the cached user for the email, or None on a miss.
+            The returned User is detached: it is built from cached fields and
+            must not be added to a session.
+
+        :param email: str: The email from the access token
+        :return: A User or None
+        """
+        data = self._l1_get(email)
+        if data is None and self._redis_available():
+            try:
+                await self._flush_invalidations()
+                raw = await get_redis().get(self._key(email))
+            except (RedisError, OSError) as err:
+                self._redis_failed(err)
+                raw = None
+            if raw is not None:
+                data = json.loads(raw)
+                self._l1_set(email, data)
+        return User(**data) if data is not None else None
+
+    async def generation(self, email: str) -> tuple:
+        """
+        The generation function reads how often the user has been invalidated so far.
+            Call it before reading the user from the database and pass the result to set.
+
+        :param email: str: The email from the access token
+        :return: An opaque value for set
+        """
+        remote = UNKNOWN
+        if self._redis_available():
+            try:
+                await self._flush_invalidations()
+                remote = await get_redis().get(self._generation_key(email))
+            except (RedisError, OSError) as err:
+                self._redis_failed(err)
+        return self._invalidations, remote
+
+    async def set(self, user: User, generation: tuple) -> None:
+        """
+        The set function stores the user in both cache levels, unless the user was
+            invalidated since ``generation`` was read; then the user may be stale and
+            nothing is stored.
+
+        :param user: User: A user loaded from the database
+        :param generation: tuple: What generation returned before the user was loaded
+        """
+        local, remote = generation
+        data = {field: getattr(user, field) for field in CACHED_FIELDS}
+        if remote is not UNKNOWN and self._redis_available():
+            try:
+                await self._flush_invalidations()
+                async with get_redis().pipeline(transaction=True) as pipe:
+                    await pipe.watch(self._generation_key(user.email))
+                    if await pipe.get(self._generation_key(user.email)) != remote:
+                        return
+                    pipe.multi()
+                    pipe.set(self._key(user.email), json.dumps(data), ex=self.ttl)
+                    await pipe.execute()
+            except WatchError:
+                return
+            except (RedisError, OSError) as err:
+                self._redis_failed(err)
+        if local == self._invalidations:
+            self._l1_set(user.email, data)
+
+    async def invalidate(self, email: str) -> None:
+        """
+        The invalidate function drops the user from both cache levels after a write.
+
+        :param email: str: The email of the changed user
+        """
+        self._l1.pop(email, None)
+        self._invalidations += 1
+        self._stale.add(email)
+        try:
+            await self._flush_invalidations()
+        except (RedisError, OSError) as err:
+            self._redis_failed(err)
+
+    def clear(self) -> None:
+        self._l1.clear()
+        self._stale.clear()
+        self._redis_down_until = 0.0
+
+
+user_cache = UserCache(settings.user_cache_ttl, settings.user_cache_l1_ttl, settings.user_cache_l1_size)
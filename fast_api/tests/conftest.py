@@ -1,20 +1,48 @@
+import os
+
+import fakeredis
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+os.environ.setdefault("RATE_LIMIT_STORAGE_URI", "memory://")
+# Every route test runs under the per-route SQL budgets.
+os.environ.setdefault("QUERY_GUARD_ENABLED", "true")
+os.environ.setdefault("QUERY_GUARD_RAISE", "true")
 
 from main import app
 from src.database.models import Base
 from src.database.db import get_db
+from src.database.redis import set_redis
+from src.services.query_guard import install_query_guard
+from src.services.revocations import revocations
+from src.services.user_cache import user_cache
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The app runs on the TestClient's own event loop, so pooled aiosqlite
+# connections must not outlive a request.
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+install_query_guard(async_engine.sync_engine)
+AsyncTestingSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fake_redis():
+    set_redis(fakeredis.FakeAsyncRedis())
+
 
 @pytest.fixture(scope="module")
 def session():
@@ -34,13 +62,15 @@ def session():
 def client(session):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    set_redis(fakeredis.FakeAsyncRedis())
+    user_cache.clear()
+    # User ids restart with every module's fresh database.
+    revocations.clear()
 
     yield TestClient(app)
 
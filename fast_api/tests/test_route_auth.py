@@ -1,25 +1,28 @@
-from unittest.mock import MagicMock
+from sqlalchemy import update
 
-from src.database.models import User
+from src.database.models import EmailOutbox, User
 from src.conf import messages
+from src.conf.config import settings
+from src.services.auth import auth_service
 
 
-def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+def test_create_user(client, user, session):
     response = client.post("/api/auth/signup", json=user)
     assert response.status_code == 201, response.text
     payload = response.json()
     assert payload["email"] == user.get("email")
+    queued = session.query(EmailOutbox).filter(EmailOutbox.recipient == user.get("email")).all()
+    assert len(queued) == 1
+    assert queued[0].status == "pending"
+    assert queued[0].host == "http://testserver/"
 
 
-def test_repeat_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+def test_repeat_create_user(client, user, session):
     response = client.post("/api/auth/signup", json=user)
     assert response.status_code == 409, response.text
     payload = response.json()
     assert payload["detail"] == "Account already exists"
+    assert session.query(EmailOutbox).filter(EmailOutbox.recipient == user.get("email")).count() == 1
 
 
 def test_login_user_not_confirmed_email(client, user):
@@ -32,6 +35,32 @@ def test_login_user_not_confirmed_email(client, user):
     assert payload["detail"] == messages.EMAIL_NOT_CONFIRMED
 
 
+def test_confirmed_email(client, user, session):
+    token = auth_service.create_email_token({"sub": user.get("email")})
+    response = client.get(f"/api/auth/confirmed_email/{token}")
+    assert response.json() == {"message": "Email confirmed"}
+    session.expire_all()
+    assert session.query(User).filter(User.email == user.get("email")).first().confirmed
+    repeated = client.get(f"/api/auth/confirmed_email/{token}")
+    assert repeated.json() == {"message": "Your email is already confirmed"}
+    unknown = auth_service.create_email_token({"sub": "nobody@example.com"})
+    assert client.get(f"/api/auth/confirmed_email/{unknown}").status_code == 400
+
+
+def test_confirmed_email_when_confirmed_is_null(client, session):
+    # Users created before the confirmed column existed hold NULL there.
+    legacy = User(username="legacy", email="legacy@example.com", password=auth_service.get_password_hash("legacy123"))
+    session.add(legacy)
+    session.commit()
+    session.execute(update(User).where(User.id == legacy.id).values(confirmed=None))
+    session.commit()
+    token = auth_service.create_email_token({"sub": "legacy@example.com"})
+    response = client.get(f"/api/auth/confirmed_email/{token}")
+    assert response.json() == {"message": "Email confirmed"}
+    response = client.post("/api/auth/login", data={"username": "legacy@example.com", "password": "legacy123"})
+    assert response.status_code == 200, response.text
+
+
 def test_login_user(client, user, session):
     current_user: User = (
         session.query(User).filter(User.email == user.get("email")).first()
@@ -74,3 +103,86 @@ def test_login_user_with_wrong_email(client, user, session):
     assert response.status_code == 401, response.text
     payload = response.json()
     assert payload["detail"] == "Invalid email"
+
+
+def login(client, user, device="tests"):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+        headers={"User-Agent": device},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def refresh(client, tokens):
+    return client.get("/api/auth/refresh_token", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+
+
+def test_refresh_token_rotates_session(client, user):
+    first, second = login(client, user, "phone"), login(client, user, "laptop")
+    rotated = refresh(client, first)
+    assert rotated.status_code == 200, rotated.text
+    assert rotated.json()["refresh_token"] != first["refresh_token"]
+    # The other device's session is untouched.
+    assert refresh(client, second).status_code == 200
+
+
+def test_reused_refresh_token_revokes_all_sessions(client, user):
+    first, other = login(client, user), login(client, user)
+    rotated = refresh(client, first).json()
+    reused = refresh(client, first)
+    assert reused.status_code == 401
+    assert reused.json()["detail"] == "Invalid refresh token"
+    assert refresh(client, rotated).status_code == 401
+    assert refresh(client, other).status_code == 401
+
+
+def test_logout(client, user):
+    tokens, other = login(client, user), login(client, user)
+    response = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 204
+    assert refresh(client, other).status_code == 200
+    assert refresh(client, tokens).status_code == 401
+    # Only refresh tokens name a session.
+    assert client.post(
+        "/api/auth/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"}
+    ).status_code == 401
+
+
+def test_logout_all(client, user):
+    devices = [login(client, user, f"device{i}") for i in range(3)]
+    response = client.post(
+        "/api/auth/logout_all", headers={"Authorization": f"Bearer {devices[0]['access_token']}"}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["revoked"] >= 3
+    assert all(refresh(client, tokens).status_code == 401 for tokens in devices)
+
+
+def test_logout_all_revokes_access_tokens(client, user):
+    tokens = login(client, user)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/api/users/me/", headers=headers).status_code == 200
+    assert client.post("/api/auth/logout_all", headers=headers).status_code == 200
+    assert client.get("/api/users/me/", headers=headers).status_code == 401
+    fresh = login(client, user)
+    assert client.get("/api/users/me/", headers={"Authorization": f"Bearer {fresh['access_token']}"}).status_code == 200
+
+
+def test_stateless_access_tokens(client, user, monkeypatch):
+    monkeypatch.setattr(settings, "auth_stateless", True)
+    tokens = login(client, user)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    async def no_lookup(email, db):
+        raise AssertionError("stateless auth read the user")
+
+    monkeypatch.setattr(auth_service, "load_user", no_lookup)
+    response = client.get("/api/users/me/", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["email"] == user.get("email")
+    assert response.json()["username"] == user.get("username")
+
+    assert client.post("/api/auth/logout_all", headers=headers).status_code == 200
+    assert client.get("/api/users/me/", headers=headers).status_code == 401
@@ -0,0 +1,320 @@
+import csv
+import io
+import json
+from datetime import date
+
+import pytest
+
+from src.database.models import Contact, User
+from src.repository import contacts as repository_contacts
+from src.schemas import ContactResponse
+from src.services.auth import auth_service
+
+
+@pytest.fixture(scope="module")
+def token(client, session):
+    owner = User(
+        username="owner",
+        email="owner@example.com",
+        password=auth_service.get_password_hash("owner123"),
+        confirmed=True,
+    )
+    session.add(owner)
+    session.commit()
+    session.add_all(
+        Contact(
+            first_name=f"Name{i}",
+            last_name=["Adams", "Brown", "Clark"][i % 3],
+            email=f"contact{i}@example.com",
+            phone_number=f"0500000{i:03d}",
+            birth_date=date(1990, 1, 1),
+            user_id=owner.id,
+        )
+        for i in range(7)
+    )
+    session.commit()
+    response = client.post("/api/auth/login", data={"username": "owner@example.com", "password": "owner123"})
+    return response.json()["access_token"]
+
+
+def test_get_contacts_pages(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/contacts/", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        payload = response.json()
+        assert len(payload["items"]) <= 3
+        seen.extend((item["last_name"], item["id"]) for item in payload["items"])
+        cursor = payload["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 7
+    assert seen == sorted(seen)
+
+
+def test_get_contacts_invalid_cursor(client, token):
+    response = client.get(
+        "/api/contacts/", params={"cursor": "not-a-cursor"}, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_export_contacts_ndjson(client, token):
+    response = client.get("/api/contacts/export", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 7
+    assert rows[0]["birth_date"] == "1990-01-01"
+
+
+def test_export_contacts_csv(client, token):
+    response = client.get(
+        "/api/contacts/export", params={"format": "csv"}, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200, response.text
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][:3] == ["id", "first_name", "last_name"]
+    assert len(rows) == 8
+
+
+def test_bulk_create_contacts(client, token):
+    rows = [
+        {"first_name": "Bulk", "last_name": "One", "email": "bulk1@example.com",
+         "phone_number": "0501111111", "birth_date": "1991-02-03"},
+        {"first_name": "Bulk", "last_name": "Two", "email": "not-an-email",
+         "phone_number": "0502222222", "birth_date": "1991-02-03"},
+        {"first_name": "Bulk", "last_name": "Dup", "email": "contact0@example.com",
+         "phone_number": "0503333333", "birth_date": "1991-02-03"},
+    ]
+    response = client.post(
+        "/api/contacts/bulk", params={"chunk_size": 2}, json=rows, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["inserted"] == 1
+    assert payload["skipped"] == 1
+    assert [error["row"] for error in payload["errors"]] == [1]
+
+
+def test_bulk_create_contacts_csv(client, token):
+    body = "first_name,last_name,email,phone_number,birth_date\nCsv,Row,csv1@example.com,0504444444,1992-03-04\n"
+    response = client.post(
+        "/api/contacts/bulk",
+        content=body,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "text/csv"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json() == {"inserted": 1, "skipped": 0, "errors": []}
+
+
+def test_search_contacts(client, token):
+    response = client.get("/api/contacts/search", params={"q": "CLAR"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload and all(item["last_name"] == "Clark" for item in payload)
+
+
+def test_search_contacts_rejects_blank_query(client, token):
+    response = client.get("/api/contacts/search", params={"q": "   "}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 422, response.text
+
+
+def test_search_contacts_ranks_prefix_first(client, token):
+    response = client.get("/api/contacts/search", params={"q": "ark"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert {item["last_name"] for item in response.json()} == {"Clark"}
+    response = client.get("/api/contacts/search", params={"q": "contact1"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.json()[0]["email"] == "contact1@example.com"
+
+
+def test_features_pages_and_cache(client, token, monkeypatch):
+    monkeypatch.setattr("main.settings.features_page_size", 5)
+    response = client.get("/features")
+    assert response.status_code == 200, response.text
+    assert response.text.count("<li>") == 5
+    assert client.get("/features").text == response.text
+    next_page = response.text.split("?after=")[1].split('"')[0]
+    assert "Fresh" not in client.get("/features", params={"after": next_page}).text
+
+    client.post(
+        "/api/contacts/bulk",
+        json=[{"first_name": "Fresh", "last_name": "Feature", "email": "fresh@example.com",
+               "phone_number": "0505555555", "birth_date": "1990-05-05"}],
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert "Fresh" in client.get("/features", params={"after": next_page}).text
+
+
+def test_get_contacts_not_modified(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/api/contacts/", headers=headers)
+    etag = response.headers["etag"]
+    assert "last-modified" in response.headers
+    not_modified = client.get("/api/contacts/", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    client.post(
+        "/api/contacts/bulk",
+        json=[{"first_name": "Etag", "last_name": "Bump", "email": "etag@example.com",
+               "phone_number": "0506666666", "birth_date": "1990-06-06"}],
+        headers=headers,
+    )
+    modified = client.get("/api/contacts/", headers={**headers, "If-None-Match": etag})
+    assert modified.status_code == 200
+    assert modified.headers["etag"] != etag
+
+
+def test_update_contact(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    contact = client.get("/api/contacts/", params={"limit": 1}, headers=headers).json()["items"][0]
+    body = {**contact, "additional_data": "updated"}
+    response = client.put(f"/api/contacts/{contact['id']}", json=body, headers=headers)
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["additional_data"] == "updated"
+    assert payload["updated_at"] >= contact["updated_at"]
+
+
+def test_fast_json_matches_response_model(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/api/contacts/", params={"limit": 2}, headers=headers)
+    assert response.headers["content-type"] == "application/json"
+    assert "etag" in response.headers
+    for item in response.json()["items"] + client.get("/api/contacts/search", params={"q": "name"}, headers=headers).json():
+        assert ContactResponse.model_validate(item).model_dump(mode="json") == item
+
+
+def test_read_only_routes_return_contacts(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    first = client.get("/api/contacts/", params={"limit": 1}, headers=headers).json()["items"][0]
+    by_id = client.get(f"/api/contacts/search_by_id/{first['id']}", headers=headers)
+    assert by_id.status_code == 200, by_id.text
+    assert by_id.json() == first
+    by_email = client.get(f"/api/contacts/search_by_email/{first['email']}", headers=headers)
+    assert by_email.json() == first
+    by_last_name = client.get(f"/api/contacts/search_by_last_name/{first['last_name']}", headers=headers).json()
+    assert first in by_last_name
+    assert all(item["last_name"] == first["last_name"] for item in by_last_name)
+    assert client.get("/api/contacts/search_by_id/999999", headers=headers).status_code == 404
+
+    birthdays = client.get("/api/contacts/birthdays", params={"days": 366}, headers=headers)
+    assert birthdays.status_code == 200
+    assert "etag" in birthdays.headers
+    for item in birthdays.json():
+        assert ContactResponse.model_validate(item).model_dump(mode="json") == item
+
+
+def test_bulk_update_contacts(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    items = client.get("/api/contacts/", params={"limit": 3}, headers=headers).json()["items"]
+    ids = [item["id"] for item in items]
+    response = client.patch(
+        "/api/contacts/bulk",
+        params={"chunk_size": 2},
+        json={"ids": ids + [999999], "changes": {"additional_data": "bulk"}},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    assert response.json() == {"affected": 3}
+    for id in ids:
+        assert client.get(f"/api/contacts/search_by_id/{id}", headers=headers).json()["additional_data"] == "bulk"
+
+    by_filter = client.patch(
+        "/api/contacts/bulk",
+        json={"filter": {"last_name": "Clark"}, "changes": {"phone_number": "0509999999"}},
+        headers=headers,
+    )
+    assert by_filter.json() == {"affected": 2}
+
+    for body in ({"changes": {"additional_data": "x"}},
+                 {"ids": ids, "filter": {"last_name": "Clark"}, "changes": {"additional_data": "x"}},
+                 {"ids": ids, "changes": {}},
+                 {"filter": {}, "changes": {"additional_data": "x"}},
+                 {"filter": {"last_name": None}, "changes": {"additional_data": "x"}}):
+        assert client.patch("/api/contacts/bulk", json=body, headers=headers).status_code == 422
+
+
+def test_bulk_update_rejects_null_required_fields(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = [item["id"] for item in client.get("/api/contacts/", params={"limit": 1}, headers=headers).json()["items"]]
+    for field in ("first_name", "last_name", "phone_number", "birth_date"):
+        response = client.patch("/api/contacts/bulk", json={"ids": ids, "changes": {field: None}}, headers=headers)
+        assert response.status_code == 422, field
+    cleared = client.patch("/api/contacts/bulk", json={"ids": ids, "changes": {"additional_data": None}}, headers=headers)
+    assert cleared.json() == {"affected": 1}
+    # Paging through the whole list still works.
+    page = client.get("/api/contacts/", params={"limit": 2}, headers=headers).json()
+    while page["next_cursor"]:
+        response = client.get("/api/contacts/", params={"limit": 2, "cursor": page["next_cursor"]}, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+
+
+def test_bulk_delete_contacts(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    by_filter = client.post("/api/contacts/bulk-delete", json={"filter": {"first_name": "Bulk"}}, headers=headers)
+    assert by_filter.status_code == 200, by_filter.text
+    assert by_filter.json() == {"affected": 1}
+    csv_contact = client.get("/api/contacts/search_by_email/csv1@example.com", headers=headers).json()
+    by_ids = client.post("/api/contacts/bulk-delete", json={"ids": [csv_contact["id"], 999999]}, headers=headers)
+    assert by_ids.json() == {"affected": 1}
+    assert client.get(f"/api/contacts/search_by_id/{csv_contact['id']}", headers=headers).status_code == 404
+
+
+def test_create_and_remove_contact(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    existing = client.get("/api/contacts/", params={"limit": 1}, headers=headers).json()["items"][0]
+    body = {
+        "id": existing["id"], "first_name": "New", "last_name": "Contact", "email": "new@example.com",
+        "phone_number": "0505555555", "birth_date": "1993-04-05",
+        "created_at": "2001-01-01T00:00:00", "updated_at": "2001-01-01T00:00:00",
+    }
+    created = client.post("/api/contacts/", json=body, headers=headers)
+    assert created.status_code == 201, created.text
+    payload = created.json()
+    assert payload["email"] == "new@example.com"
+    # The posted id and timestamps are ignored; the database assigns them.
+    assert payload["id"] != existing["id"]
+    assert not payload["created_at"].startswith("2001")
+    assert client.get(f"/api/contacts/search_by_id/{existing['id']}", headers=headers).json() == existing
+    assert ContactResponse.model_validate(payload).model_dump(mode="json") == payload
+    duplicate = client.post("/api/contacts/", json=body, headers=headers)
+    assert duplicate.status_code == 409
+
+    removed = client.delete(f"/api/contacts/{payload['id']}", headers=headers)
+    assert removed.status_code == 204
+    assert removed.content == b""
+    assert client.delete(f"/api/contacts/{payload['id']}", headers=headers).status_code == 404
+
+
+def test_bulk_create_contacts_max_chunk(client, session):
+    importer = User(
+        username="importer",
+        email="importer@example.com",
+        password=auth_service.get_password_hash("importer123"),
+        confirmed=True,
+    )
+    session.add(importer)
+    session.commit()
+    response = client.post("/api/auth/login", data={"username": "importer@example.com", "password": "importer123"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    rows = [
+        {"first_name": "Max", "last_name": f"Chunk{i}", "email": f"chunk{i}@example.com",
+         "phone_number": "0507777777", "birth_date": "1990-07-07"}
+        for i in range(repository_contacts.MAX_BULK_CHUNK)
+    ]
+    response = client.post(
+        "/api/contacts/bulk", params={"chunk_size": repository_contacts.MAX_BULK_CHUNK + 1}, json=rows, headers=headers
+    )
+    assert response.status_code == 422
+    response = client.post(
+        "/api/contacts/bulk", params={"chunk_size": repository_contacts.MAX_BULK_CHUNK}, json=rows, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    assert response.json() == {"inserted": repository_contacts.MAX_BULK_CHUNK, "skipped": 0, "errors": []}
@@ -0,0 +1,49 @@
+from src.database.models import User
+from src.services.auth import auth_service
+
+
+def sample(text: str, line_start: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_record_route_templates(client):
+    assert client.get("/api/healthchecker").status_code == 200
+    assert client.get("/api/users/12345/avatar").status_code == 404
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert sample(text, 'http_request_duration_seconds_count{method="GET",route="/api/healthchecker",status="200"}') >= 1
+    assert sample(text, 'http_request_duration_seconds_count{method="GET",route="/api/users/{user_id}/avatar",status="404"}') >= 1
+    assert 'http_requests_in_progress{method="GET"}' in text
+    assert "db_pool_checked_out" in text
+    assert "db_pool_checkout_wait_seconds_bucket" in text
+
+
+def test_metrics_count_rate_limit_rejections(client):
+    before = sample(client.get("/metrics").text, 'rate_limit_rejections_total{route="/"}')
+    statuses = [client.get("/").status_code for _ in range(6)]
+    assert 429 in statuses
+    after = sample(client.get("/metrics").text, 'rate_limit_rejections_total{route="/"}')
+    assert after - before == statuses.count(429)
+
+
+def test_pool_healthchecker_requires_auth(client, session):
+    assert client.get("/api/healthchecker/pool").status_code == 401
+
+    session.add(User(
+        username="operator",
+        email="operator@example.com",
+        password=auth_service.get_password_hash("operator123"),
+        confirmed=True,
+    ))
+    session.commit()
+    response = client.post("/api/auth/login", data={"username": "operator@example.com", "password": "operator123"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = client.get("/api/healthchecker/pool", headers=headers)
+    assert response.status_code == 200, response.text
+    assert "wait_seconds" in response.json()
@@ -0,0 +1,108 @@
+import io
+
+import pytest
+from PIL import Image
+
+from src.conf.config import settings
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.local_image import LocalImage
+from src.services.thumbnail_cache import ThumbnailCache
+
+
+@pytest.fixture(scope="module")
+def token(client, session):
+    session.add(User(
+        username="painter",
+        email="painter@example.com",
+        password=auth_service.get_password_hash("painter123"),
+        confirmed=True,
+    ))
+    session.commit()
+    response = client.post("/api/auth/login", data={"username": "painter@example.com", "password": "painter123"})
+    return response.json()["access_token"]
+
+
+@pytest.fixture
+def local_storage(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "avatar_storage", "local")
+    monkeypatch.setattr(LocalImage, "root", tmp_path)
+    return tmp_path
+
+
+def png(width, height):
+    out = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 10, 10, 128)).save(out, "PNG")
+    return out.getvalue()
+
+
+def test_update_avatar_resizes_and_stores_locally(client, token, local_storage):
+    response = client.patch(
+        "/api/users/avatar",
+        files={"file": ("me.png", png(800, 500), "image/png")},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200, response.text
+    avatar = response.json()["avatar"]
+    assert avatar.startswith("/static/avatars/Avatar_folder/")
+    [stored] = local_storage.rglob("*.jpg")
+    assert avatar.split("?")[0].endswith(stored.name)
+    with Image.open(stored) as image:
+        assert image.size == (250, 250)
+        assert image.format == "JPEG"
+
+
+def test_update_avatar_rejects_invalid_image(client, token, local_storage):
+    response = client.patch(
+        "/api/users/avatar",
+        files={"file": ("me.png", b"not an image", "image/png")},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 400, response.text
+
+
+def test_update_avatar_rejects_large_upload(client, token, local_storage, monkeypatch):
+    monkeypatch.setattr(settings, "avatar_max_bytes", 1024)
+    response = client.patch(
+        "/api/users/avatar",
+        files={"file": ("me.png", b"0" * 200_000, "image/png")},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 413, response.text
+    assert list(local_storage.rglob("*.jpg")) == []
+
+
+@pytest.fixture
+def thumbnails(monkeypatch, tmp_path):
+    cache = ThumbnailCache(tmp_path / "thumbnails", 1024 * 1024)
+    monkeypatch.setattr("src.services.avatars.thumbnail_cache", cache)
+    return cache
+
+
+def test_get_avatar_serves_cached_thumbnail(client, token, local_storage, thumbnails):
+    headers = {"Authorization": f"Bearer {token}"}
+    user = client.patch("/api/users/avatar", files={"file": ("me.png", png(400, 400), "image/png")}, headers=headers).json()
+
+    response = client.get(f"/api/users/{user['id']}/avatar", params={"size": 64})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["cache-control"] == "public, no-cache"
+    etag = response.headers["etag"]
+    assert not etag.startswith("W/")
+    with Image.open(io.BytesIO(response.content)) as image:
+        assert image.size == (64, 64)
+    assert len(list(thumbnails.root.glob("*.jpg"))) == 1
+
+    response = client.get(f"/api/users/{user['id']}/avatar", params={"size": 64}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get(f"/api/users/{user['id']}/avatar", params={"size": 64, "v": etag.strip('"')})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert len(list(thumbnails.root.glob("*.jpg"))) == 1
+
+
+def test_get_avatar_unknown_user(client, thumbnails):
+    response = client.get("/api/users/9999/avatar")
+    assert response.status_code == 404, response.text
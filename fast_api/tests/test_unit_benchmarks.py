@@ -0,0 +1,33 @@
+import unittest
+
+from benchmarks.suite import compare
+
+
+def report(**metrics):
+    row = {"name": "list", "concurrency": 8, "errors": 0, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "rps": 100.0}
+    return {"results": [{**row, **metrics}]}
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_within_threshold(self):
+        self.assertEqual(compare(report(), report(p95_ms=23.0, rps=85.0), 0.2), [])
+
+    def test_latency_regression(self):
+        [regression] = compare(report(), report(p99_ms=40.0), 0.2)
+        self.assertIn("list @ 8: p99_ms 30.0 -> 40.0", regression)
+
+    def test_throughput_regression(self):
+        [regression] = compare(report(), report(rps=70.0), 0.2)
+        self.assertIn("rps", regression)
+
+    def test_new_errors_regress(self):
+        [regression] = compare(report(), report(errors=3), 0.2)
+        self.assertIn("errors 0 -> 3", regression)
+
+    def test_unmatched_results_are_ignored(self):
+        self.assertEqual(compare(report(), report(concurrency=32, p50_ms=100.0), 0.2), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+import fakeredis
+
+from src.database.redis import get_redis, set_redis
+from src.services import contacts_version
+from src.services.contacts_version import contacts_changed, get_contacts_version
+
+
+class TestContactsVersion(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.previous_redis = get_redis()
+        self.server = fakeredis.FakeServer()
+        set_redis(fakeredis.FakeAsyncRedis(server=self.server))
+        contacts_version._pending.clear()
+
+    def tearDown(self):
+        set_redis(self.previous_redis)
+        contacts_version._pending.clear()
+
+    async def test_changed_bumps_version(self):
+        first = await get_contacts_version(1)
+        await contacts_changed(1)
+        self.assertNotEqual(await get_contacts_version(1), first)
+
+    async def test_bump_lost_to_redis_outage_is_retried(self):
+        old_version, _ = await get_contacts_version(1)
+        self.server.connected = False
+        await contacts_changed(1)
+        self.assertIsNone(await get_contacts_version(1))
+        self.server.connected = True
+        # The first read after the outage writes the kept bump, so the old ETag no longer matches.
+        version, _ = await get_contacts_version(1)
+        self.assertNotEqual(version, old_version)
+        self.assertEqual(contacts_version._pending, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import logging
+
+from sqlalchemy import create_engine, text
+
+from src.database.pool import PoolStats, install_slow_query_log
+
+
+def test_pool_stats_histogram():
+    stats = PoolStats(buckets=(0.01, 0.1))
+    stats.observe_wait(0.001)
+    stats.observe_wait(0.05)
+    stats.observe_wait(2)
+    snapshot = stats.snapshot()
+    assert snapshot["checked_out"] == 0
+    assert snapshot["wait_seconds"]["count"] == 3
+    assert snapshot["wait_seconds"]["buckets"] == {"0.01": 1, "0.1": 1, "+Inf": 1}
+
+
+def test_slow_query_log(caplog):
+    engine = create_engine("sqlite://")
+    install_slow_query_log(engine, threshold=0, sample_rate=1)
+    with caplog.at_level(logging.WARNING, logger="src.database.pool"), engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert "Slow query" in caplog.text
+
+
+def test_slow_query_log_below_threshold(caplog):
+    engine = create_engine("sqlite://")
+    install_slow_query_log(engine, threshold=60, sample_rate=1)
+    with caplog.at_level(logging.WARNING, logger="src.database.pool"), engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert "Slow query" not in caplog.text
@@ -0,0 +1,122 @@
+import socket
+import unittest
+from datetime import datetime, timedelta
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.database.models import Base, EmailOutbox
+from src.repository.outbox import claim_batch, enqueue_email
+from src.services.email_worker import OutboxWorker, SMTPPool
+from src.services.emails import build_confirmation_email
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestOutboxWorker(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.sessions = async_sessionmaker(bind=self.engine, expire_on_commit=False, class_=AsyncSession)
+        self.inbox = Inbox()
+        self.controller = Controller(self.inbox, hostname="127.0.0.1", port=free_port())
+        self.controller.start()
+
+    async def asyncTearDown(self):
+        self.controller.stop()
+        await self.engine.dispose()
+
+    def pool(self, port, size=2):
+        return SMTPPool(size, lambda: aiosmtplib.SMTP(hostname="127.0.0.1", port=port, timeout=5))
+
+    async def enqueue(self, count):
+        async with self.sessions() as db:
+            for i in range(count):
+                await enqueue_email(f"user{i}@example.com", f"user{i}", "http://testserver/", db)
+
+    async def outbox(self):
+        async with self.sessions() as db:
+            return (await db.execute(select(EmailOutbox).order_by(EmailOutbox.id))).scalars().all()
+
+    async def test_sends_batch_over_pooled_connections(self):
+        await self.enqueue(6)
+        worker = OutboxWorker(self.sessions, self.pool(self.controller.port), batch_size=4)
+        self.assertEqual(await worker.run_once(), 4)
+        self.assertEqual(await worker.run_once(), 2)
+        self.assertEqual(await worker.run_once(), 0)
+        await worker.pool.close()
+        self.assertEqual(len(self.inbox.messages), 6)
+        self.assertEqual(self.inbox.messages[0].rcpt_tos, ["user0@example.com"])
+        self.assertIn(b"api/auth/confirmed_email/", self.inbox.messages[0].content)
+        self.assertLessEqual(worker.pool.connects, 2)
+        self.assertEqual(worker.stats.sent, 6)
+        self.assertTrue(all(message.status == "sent" and message.sent_at for message in await self.outbox()))
+
+    async def test_reconnects_when_server_closed_idle_connection(self):
+        pool = self.pool(self.controller.port, size=1)
+        await pool.send_message(build_confirmation_email("user0@example.com", "user0", "http://testserver/"))
+        # Restarting the server closes the pooled connection while it is idle; the
+        # client only notices when the next send uses it.
+        port = self.controller.port
+        self.controller.stop()
+        self.controller = Controller(self.inbox, hostname="127.0.0.1", port=port)
+        self.controller.start()
+        await pool.send_message(build_confirmation_email("user1@example.com", "user1", "http://testserver/"))
+        await pool.close()
+        self.assertEqual([message.rcpt_tos for message in self.inbox.messages],
+                         [["user0@example.com"], ["user1@example.com"]])
+        self.assertEqual(pool.connects, 2)
+
+    async def test_failed_send_is_retried_with_backoff(self):
+        await self.enqueue(1)
+        worker = OutboxWorker(self.sessions, self.pool(free_port()), max_attempts=2, retry_base=60)
+        self.assertEqual(await worker.run_once(), 1)
+        [message] = await self.outbox()
+        self.assertEqual((message.status, message.attempts), ("pending", 1))
+        self.assertGreater(message.next_attempt_at, datetime.utcnow() + timedelta(seconds=50))
+        self.assertEqual(await worker.run_once(), 0)
+        self.assertEqual(worker.stats.retried, 1)
+
+        async with self.sessions() as db:
+            message.next_attempt_at = datetime.utcnow()
+            await db.merge(message)
+            await db.commit()
+        await worker.run_once()
+        [message] = await self.outbox()
+        self.assertEqual((message.status, message.attempts), ("failed", 2))
+        self.assertEqual(worker.stats.failed, 1)
+
+    async def test_claim_leases_rows(self):
+        await self.enqueue(3)
+        async with self.sessions() as db:
+            self.assertEqual(len(await claim_batch(db, 10, timedelta(minutes=5))), 3)
+            self.assertEqual(await claim_batch(db, 10, timedelta(minutes=5)), [])
+
+    def test_retry_delay_is_exponential_and_bounded(self):
+        worker = OutboxWorker(self.sessions, SMTPPool(1),
+                              max_attempts=20, retry_base=30)
+        self.assertEqual(worker.retry_delay(1), timedelta(seconds=30))
+        self.assertEqual(worker.retry_delay(3), timedelta(seconds=120))
+        self.assertEqual(worker.retry_delay(19), timedelta(seconds=3600))
+        self.assertIsNone(worker.retry_delay(20))
+
+
+if __name__ == '__main__':
+    unittest.main()
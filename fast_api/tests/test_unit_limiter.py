@@ -0,0 +1,35 @@
+import asyncio
+
+from starlette.requests import Request
+
+from src.services.auth import auth_service
+from src.conf.config import settings
+from src.services.limiter import default_limits, limiter, rate_limit_key
+
+
+def make_request(authorization: str | None = None) -> Request:
+    headers = [(b"authorization", authorization.encode())] if authorization else []
+    return Request({"type": "http", "headers": headers, "client": ("10.0.0.1", 1234)})
+
+
+def test_rate_limit_key_anonymous():
+    assert rate_limit_key(make_request()) == "10.0.0.1"
+
+
+def test_rate_limit_key_user():
+    token = asyncio.run(auth_service.create_access_token(data={"sub": "user@example.com"}))
+    assert rate_limit_key(make_request(f"Bearer {token}")) == "user:user@example.com"
+
+
+def test_rate_limit_key_refresh_token_and_forged_token():
+    refresh_token = asyncio.run(auth_service.create_refresh_token(data={"sub": "user@example.com"}))
+    assert rate_limit_key(make_request(f"Bearer {refresh_token}")) == "10.0.0.1"
+    assert rate_limit_key(make_request("Bearer not.a.token")) == "10.0.0.1"
+
+
+def test_default_limits_are_opt_in(monkeypatch):
+    assert limiter._default_limits == []
+    monkeypatch.setattr(settings, "rate_limit_default", "")
+    assert default_limits() == []
+    monkeypatch.setattr(settings, "rate_limit_default", "600/minute")
+    assert default_limits() == ["600/minute"]
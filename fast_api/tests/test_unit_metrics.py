@@ -0,0 +1,51 @@
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.services.metrics import BACKGROUND_TASKS, _request_queries, install_query_metrics, track_task
+
+
+class TestQueryMetrics(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        install_query_metrics(self.engine.sync_engine)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_counts_statements_of_current_request(self):
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                await conn.execute(text("SELECT 2"))
+        finally:
+            _request_queries.reset(token)
+        self.assertEqual(queries[0], 2)
+        self.assertGreater(queries[1], 0)
+
+    async def test_statements_outside_requests_are_not_attributed(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        self.assertIsNone(_request_queries.get())
+
+
+class TestTrackTask(unittest.IsolatedAsyncioTestCase):
+
+    async def test_counts_outcomes(self):
+        ok = BACKGROUND_TASKS.labels("unit", "ok")._value.get()
+        error = BACKGROUND_TASKS.labels("unit", "error")._value.get()
+        async with track_task("unit"):
+            pass
+        with self.assertRaises(RuntimeError):
+            async with track_task("unit"):
+                raise RuntimeError
+        self.assertEqual(BACKGROUND_TASKS.labels("unit", "ok")._value.get(), ok + 1)
+        self.assertEqual(BACKGROUND_TASKS.labels("unit", "error")._value.get(), error + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+from sqlalchemy import create_engine, select, text
+
+from src.database.models import Base, Contact
+from src.repository.contacts import RESPONSE_COLUMNS
+
+
+def test_contacts_indexes():
+    # Mirrors the migrations at head: each index serves a query in src.repository.contacts.
+    indexes = {index.name: [column.name for column in index.columns] for index in Contact.__table__.indexes}
+    assert indexes == {
+        "ix_contacts_user_id_id": ["user_id", "id"],
+        "ix_contacts_user_id_last_name_id": ["user_id", "last_name", "id"],
+        "uq_contacts_user_id_email": ["user_id", "email"],
+        "ix_contacts_user_id_birth_md": ["user_id", "birth_md"],
+        "ix_contacts_first_name_trgm": ["first_name"],
+        "ix_contacts_last_name_trgm": ["last_name"],
+        "ix_contacts_email_trgm": ["email"],
+        "ix_contacts_phone_number_trgm": ["phone_number"],
+    }
+
+
+def test_contacts_list_uses_keyset_index():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    stmt = select(*RESPONSE_COLUMNS).filter_by(user_id=1).order_by(Contact.last_name, Contact.id)
+    sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert "ix_contacts_user_id_last_name_id" in plan
+    assert "TEMP B-TREE" not in plan
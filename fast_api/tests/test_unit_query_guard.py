@@ -0,0 +1,76 @@
+import unittest
+import unittest.mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from src.services.query_guard import (
+    QueryBudgetExceeded, QueryGuardMiddleware, install_query_guard, query_budget, track_queries,
+)
+
+
+class TestQueryGuard(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        install_query_guard(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def run_lookups(self, n):
+        with self.engine.connect() as conn:
+            for i in range(n):
+                conn.execute(text("SELECT :id"), {"id": i})
+
+    def test_repeated_statement_is_flagged_with_call_site(self):
+        with track_queries(repeat_threshold=3) as tracker:
+            self.run_lookups(4)
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 'once'"))
+        self.assertEqual(tracker.total, 5)
+        self.assertEqual(tracker.repeated(), [("SELECT ?", 4)])
+        site = tracker.call_sites["SELECT ?"]
+        self.assertIn("run_lookups", site)
+        self.assertNotIn("sqlalchemy", site)
+
+    def test_statements_outside_tracking_are_ignored(self):
+        self.run_lookups(2)
+        with track_queries() as tracker:
+            pass
+        self.assertEqual(tracker.total, 0)
+
+    def test_middleware_enforces_route_budget(self):
+        app = FastAPI()
+        app.add_middleware(QueryGuardMiddleware)
+
+        @app.get("/cheap")
+        @query_budget(2)
+        def cheap():
+            self.run_lookups(2)
+            return {}
+
+        @app.get("/chatty")
+        @query_budget(2)
+        def chatty():
+            self.run_lookups(3)
+            return {}
+
+        @app.get("/unbounded")
+        @query_budget(None)
+        def unbounded():
+            self.run_lookups(50)
+            return {}
+
+        with unittest.mock.patch("src.services.query_guard.settings.query_guard_raise", True):
+            client = TestClient(app)
+            self.assertEqual(client.get("/cheap").status_code, 200)
+            self.assertEqual(client.get("/unbounded").status_code, 200)
+            with self.assertLogs("src.services.query_guard", "WARNING"), \
+                    self.assertRaisesRegex(QueryBudgetExceeded, "GET /chatty ran 3 SQL statements, budget is 2"):
+                client.get("/chatty")
+
+
+if __name__ == '__main__':
+    unittest.main()
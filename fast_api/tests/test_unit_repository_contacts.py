@@ -1,18 +1,29 @@
-from sqlalchemy.orm import Session
+from datetime import date
+
+from sqlalchemy import Delete, Update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
 
 from faker import Faker
 
 from src.database.models import User, Contact
-from src.schemas import ContactBase, ContactResponse
+from src.schemas import ContactBase, ContactChanges, ContactResponse, ContactSelection
 from src.repository.contacts import (
     get_contact_by_email,
     get_contact_by_id,
     get_contacts,
     create,
     update,
+    remove,
+    get_birthdays,
+    bulk_update,
+    bulk_delete,
+    CREATE_FIELDS,
+    MAX_BIND_PARAMS,
+    MAX_BULK_CHUNK,
 )
 
 fake = Faker()
@@ -20,12 +31,37 @@ fake = Faker()
 
 class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
         self.user = User(id=1, email="test@test.com")
 
+    async def test_bulk_update_by_filter_is_one_statement(self):
+        self.session.execute.return_value = MagicMock(rowcount=4)
+        selection = ContactSelection(filter={"last_name": "Clark"})
+        result = await bulk_update(ContactChanges(additional_data="x"), selection, self.user.id, self.session)
+        self.assertEqual(result, 4)
+        self.session.execute.assert_awaited_once()
+        self.assertIsInstance(self.session.execute.await_args.args[0], Update)
+
+    async def test_bulk_delete_by_filter_is_one_statement(self):
+        self.session.execute.return_value = MagicMock(rowcount=2)
+        selection = ContactSelection(filter={"created_before": "2020-01-01T00:00:00"})
+        result = await bulk_delete(selection, self.user.id, self.session)
+        self.assertEqual(result, 2)
+        self.session.execute.assert_awaited_once()
+        self.assertIsInstance(self.session.execute.await_args.args[0], Delete)
+
+    def test_bulk_chunk_fits_bind_limit(self):
+        row = {field: "x" for field in CREATE_FIELDS}
+        stmt = postgresql.insert(Contact).values([{**row, "user_id": 1}] * MAX_BULK_CHUNK)
+        self.assertLessEqual(len(stmt.compile(dialect=postgresql.dialect()).params), MAX_BIND_PARAMS)
+        stmt = postgresql.insert(Contact).values([{**row, "user_id": 1}] * (MAX_BULK_CHUNK + 1))
+        self.assertGreater(len(stmt.compile(dialect=postgresql.dialect()).params), MAX_BIND_PARAMS)
+
     async def test_get_contacts(self):
         contacts = [Contact(), Contact(), Contact()]
-        self.session.query().filter_by().all.return_value = contacts
+        mocked_contacts = MagicMock()
+        mocked_contacts.all.return_value = contacts
+        self.session.execute.return_value = mocked_contacts
         result = await get_contacts(self.session, self.user)
         self.assertEqual(result, contacts)
 
@@ -34,9 +70,9 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         user_id = self.user.id
         expected_contact = Contact(id=contact_id, user_id=user_id)
 
-        self.session.query(Contact).filter_by(
-            id=contact_id, user_id=user_id
-        ).first.return_value = expected_contact
+        mocked_contact = MagicMock()
+        mocked_contact.scalars.return_value.first.return_value = expected_contact
+        self.session.execute.return_value = mocked_contact
 
         result = await get_contact_by_id(contact_id, user_id, self.session)
 
@@ -46,57 +82,77 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         user_id = self.user.id
         email = "test@example.com"
         expected_contact = Contact(email=email, user_id=user_id)
-        self.session.query(Contact).filter_by(
-            email=email, user_id=user_id
-        ).first.return_value = expected_contact
+        mocked_contact = MagicMock()
+        mocked_contact.scalars.return_value.first.return_value = expected_contact
+        self.session.execute.return_value = mocked_contact
         result = await get_contact_by_email(email, user_id, self.session)
         self.assertEqual(result, expected_contact)
 
+
+class SQLiteTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        from src.database.models import Base
+
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.user = User(id=1, username="u", email="u@test.com", password="x")
+        self.session.add(self.user)
+        for i, birth_date in enumerate(["1950-12-30", "2001-01-02", "1985-01-20", "1999-06-15"]):
+            self.session.add(Contact(
+                first_name=f"C{i}", last_name="L", email=f"c{i}@test.com", phone_number="1",
+                birth_date=date.fromisoformat(birth_date), user_id=1,
+            ))
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+
+class TestBirthdays(SQLiteTestCase):
+    async def test_ignores_birth_year(self):
+        result = await get_birthdays(date(2024, 6, 10), date(2024, 6, 17), self.session, self.user)
+        self.assertEqual([c.first_name for c in result], ["C3"])
+
+    async def test_wraps_new_year(self):
+        result = await get_birthdays(date(2024, 12, 28), date(2025, 1, 4), self.session, self.user)
+        self.assertEqual([c.first_name for c in result], ["C0", "C1"])
+
+    async def test_whole_year(self):
+        result = await get_birthdays(date(2024, 6, 1), date(2025, 6, 1), self.session, self.user)
+        self.assertEqual([c.first_name for c in result], ["C3", "C0", "C1", "C2"])
+
+
+class TestContactWrites(SQLiteTestCase):
+    def body(self, **fields) -> ContactBase:
+        return ContactBase(**{
+            "id": 100, "first_name": "John", "last_name": "Mnemonick", "email": "johnys@email.net",
+            "phone_number": "80129992233", "birth_date": date(1990, 5, 6),
+            "created_at": fake.date_time_this_year(), "updated_at": fake.date_time_this_year(),
+            **fields,
+        })
+
     async def test_create(self):
-        body = ContactBase(
-            id=1,
-            first_name="John",
-            last_name="Mnemonick",
-            email="Johnys@email.net",
-            phone_number="80129992233",
-            birth_date=fake.date(),
-            created_at=fake.date_time_this_year(),
-            updated_at=fake.date_time_this_year(),
-        )
-
-        # test свариться, що багато user_id передаю
-        body_data = body.model_dump()
-        body_data.pop("user_id", None)
-
-        result = await create(body_data, self.session, self.user)
-        self.assertEqual(result.first_name, body.first_name)
-        self.assertTrue(hasattr(result, "id"))
+        result = await create(self.body().model_dump(), self.session, self.user)
+        self.assertEqual(result.first_name, "John")
+        self.assertEqual(result.user_id, self.user.id)
+        self.assertNotEqual(result.id, 100)
+        self.assertIsNone(await create(self.body(id=101).model_dump(), self.session, self.user))
 
     async def test_update_contact(self):
-        contact_id = 1
-        user_id = self.user.id
-        email = "old@example.com"
-        contact = Contact(id=contact_id, email=email, user_id=user_id)
-
-        with patch(
-            "src.repository.contacts.get_contact_by_id"
-        ) as mock_get_contact_by_id:
-            mock_get_contact_by_id.return_value = contact
-
-            new_email = "new@example.com"
-            body = ContactBase(
-                id=contact_id,
-                email=new_email,
-                first_name="Sulan",
-                last_name="Rkira",
-                phone_number="646646466",
-                birth_date=fake.date(),
-                additional_data="",
-                created_at=fake.date_time_this_year(),
-                updated_at=fake.date_time_this_year(),
-            )
-
-            updated_contact = await update(contact_id, body, user_id, self.session)
-
-            self.assertEqual(updated_contact.email, new_email)
-            self.assertTrue(self.session.commit.called)
+        created = await create(self.body().model_dump(), self.session, self.user)
+        updated = await update(created.id, self.body(email="new@example.com"), self.user.id, self.session)
+        self.assertEqual(updated.email, "new@example.com")
+        self.assertEqual(updated.first_name, "John")
+        self.assertIsNone(await update(created.id, self.body(), 2, self.session))
+
+    async def test_remove(self):
+        created = await create(self.body().model_dump(), self.session, self.user)
+        self.assertIsNone(await remove(created.id, 2, self.session))
+        removed = await remove(created.id, self.user.id, self.session)
+        self.assertEqual(removed.email, "johnys@email.net")
+        self.assertIsNone(await get_contact_by_id(created.id, self.user.id, self.session))
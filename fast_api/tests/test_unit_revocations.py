@@ -0,0 +1,60 @@
+import unittest
+
+import fakeredis
+from redis.exceptions import ConnectionError
+
+from src.database.redis import get_redis, set_redis
+from src.services.revocations import RevocationList
+
+
+class BrokenRedis:
+    async def zadd(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    def pipeline(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+
+class TestRevocationList(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.previous_redis = get_redis()
+        self.redis = fakeredis.FakeAsyncRedis()
+        set_redis(self.redis)
+
+    def tearDown(self):
+        set_redis(self.previous_redis)
+
+    async def test_revoke_applies_locally_and_syncs_to_other_processes(self):
+        here, there = RevocationList(sync_interval=0, token_ttl=60), RevocationList(sync_interval=0, token_ttl=60)
+        await here.revoke(1, 2)
+        self.assertEqual(here.min_version(1), 2)
+        self.assertEqual(there.min_version(1), 0)
+        await there.sync()
+        self.assertEqual(there.min_version(1), 2)
+        self.assertEqual(there.min_version(2), 0)
+
+    async def test_sync_is_throttled(self):
+        here, there = RevocationList(sync_interval=60, token_ttl=60), RevocationList(sync_interval=60, token_ttl=60)
+        await there.sync()
+        await here.revoke(1, 1)
+        await there.sync()
+        self.assertEqual(there.min_version(1), 0)
+
+    async def test_expired_revocations_are_dropped(self):
+        revocations = RevocationList(sync_interval=0, token_ttl=-1)
+        await revocations.revoke(1, 1)
+        await revocations.sync()
+        self.assertEqual(revocations.min_version(1), 0)
+        self.assertEqual(await self.redis.zcard("auth:revocations"), 0)
+
+    async def test_redis_down_publishes_later(self):
+        revocations = RevocationList(sync_interval=0, token_ttl=60)
+        set_redis(BrokenRedis())
+        await revocations.revoke(1, 3)
+        await revocations.sync()
+        self.assertEqual(revocations.min_version(1), 3)
+        set_redis(self.redis)
+        await revocations.sync()
+        other = RevocationList(sync_interval=0, token_ttl=60)
+        await other.sync()
+        self.assertEqual(other.min_version(1), 3)
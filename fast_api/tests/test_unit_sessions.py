@@ -0,0 +1,51 @@
+import unittest
+
+import fakeredis
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+
+from src.database.redis import get_redis, set_redis
+from src.services.sessions import SessionStore
+
+
+class BrokenRedis:
+    def pipeline(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+
+class TestSessionStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.previous_redis = get_redis()
+        self.redis = fakeredis.FakeAsyncRedis()
+        set_redis(self.redis)
+        self.store = SessionStore(ttl=60)
+
+    def tearDown(self):
+        set_redis(self.previous_redis)
+
+    async def test_create_sets_ttl(self):
+        jti = await self.store.create("a@test.com", "phone")
+        self.assertGreater(await self.redis.ttl(f"session:{jti}"), 0)
+        self.assertEqual(await self.store.count("a@test.com"), 1)
+
+    async def test_rotate_is_single_use(self):
+        jti = await self.store.create("a@test.com")
+        new_jti = await self.store.rotate(jti, "a@test.com")
+        self.assertIsNotNone(new_jti)
+        self.assertIsNone(await self.store.rotate(jti, "a@test.com"))
+        self.assertEqual(await self.store.count("a@test.com"), 1)
+
+    async def test_revoke_all_keeps_other_users(self):
+        for _ in range(3):
+            await self.store.create("a@test.com")
+        other = await self.store.create("b@test.com")
+        self.assertEqual(await self.store.revoke_all("a@test.com"), 3)
+        self.assertEqual(await self.store.count("a@test.com"), 0)
+        self.assertEqual(await self.store.revoke_all("a@test.com"), 0)
+        self.assertTrue(await self.store.pop(other, "b@test.com"))
+
+    async def test_redis_down(self):
+        set_redis(BrokenRedis())
+        with self.assertRaises(HTTPException) as raised:
+            await self.store.create("a@test.com")
+        self.assertEqual(raised.exception.status_code, 503)
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.services.thumbnail_cache import ThumbnailCache
+
+
+class TestThumbnailCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ThumbnailCache(self.tmp.name, max_bytes=250)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_evicts_least_recently_used_by_bytes(self):
+        await self.cache.put("a", b"a" * 100)
+        await self.cache.put("b", b"b" * 100)
+        self.assertIsNotNone(await self.cache.get("a"))
+        await self.cache.put("c", b"c" * 100)
+        self.assertIsNone(await self.cache.get("b"))
+        self.assertFalse(self.cache.path("b").exists())
+        self.assertEqual(self.cache.path("a").read_bytes(), b"a" * 100)
+        self.assertEqual(self.cache.size, 200)
+
+    async def test_replacing_entry_updates_size(self):
+        await self.cache.put("a", b"a" * 100)
+        await self.cache.put("a", b"a" * 50)
+        self.assertEqual(self.cache.size, 50)
+
+    async def test_index_is_rebuilt_from_disk(self):
+        await self.cache.put("old", b"o" * 100)
+        await self.cache.put("new", b"n" * 100)
+        os.utime(self.cache.path("old"), (1, 1))
+        cache = ThumbnailCache(self.tmp.name, max_bytes=250)
+        self.assertIsNotNone(await cache.get("new"))
+        self.assertEqual(cache.size, 200)
+        await cache.put("third", b"t" * 100)
+        self.assertIsNone(await cache.get("old"))
+        self.assertIsNotNone(await cache.get("new"))
+
+    async def test_index_is_scanned_in_a_thread(self):
+        with patch("asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            self.assertIsNone(await self.cache.get("a"))
+            self.assertIsNone(await self.cache.get("b"))
+        to_thread.assert_called_once_with(self.cache._scan)
+
+    async def test_concurrent_misses_create_once(self):
+        calls = 0
+
+        async def create():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return b"x" * 10
+
+        paths = await asyncio.gather(*(self.cache.get_or_create("k", create) for _ in range(5)))
+        self.assertEqual(calls, 1)
+        self.assertEqual(len(set(paths)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
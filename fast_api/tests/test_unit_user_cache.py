@@ -0,0 +1,105 @@
+import unittest
+
+import fakeredis
+from redis.exceptions import ConnectionError
+
+from src.database.models import User
+from src.database.redis import get_redis, set_redis
+from src.services.user_cache import UserCache
+
+
+class BrokenRedis:
+    async def get(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    set = delete = get
+
+    def pipeline(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.previous_redis = get_redis()
+        self.redis = fakeredis.FakeAsyncRedis()
+        set_redis(self.redis)
+        self.cache = UserCache(ttl=60, l1_ttl=60, l1_size=2)
+        self.user = User(id=1, username="test", email="test@test.com", avatar="a.png", confirmed=True,
+                         password="hash")
+
+    def tearDown(self):
+        set_redis(self.previous_redis)
+
+    async def fill(self, user):
+        await self.cache.set(user, await self.cache.generation(user.email))
+
+    async def test_set_get(self):
+        await self.fill(self.user)
+        cached = await self.cache.get(self.user.email)
+        self.assertEqual(cached.id, self.user.id)
+        self.assertTrue(cached.confirmed)
+        self.assertIsNone(cached.password)
+
+    async def test_get_from_redis_after_l1_miss(self):
+        await self.fill(self.user)
+        self.cache.clear()
+        cached = await self.cache.get(self.user.email)
+        self.assertEqual(cached.username, self.user.username)
+
+    async def test_invalidate(self):
+        await self.fill(self.user)
+        await self.cache.invalidate(self.user.email)
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.assertIsNone(await self.redis.get("user:test@test.com"))
+
+    async def test_l1_is_bounded(self):
+        for i in range(3):
+            await self.fill(User(id=i, username="u", email=f"{i}@test.com", avatar="", confirmed=True))
+        self.assertEqual(len(self.cache._l1), 2)
+
+    async def test_redis_down(self):
+        set_redis(BrokenRedis())
+        await self.fill(self.user)
+        self.cache._l1.clear()
+        self.assertIsNone(await self.cache.get(self.user.email))
+
+    async def test_invalidate_while_redis_down_is_retried(self):
+        await self.fill(self.user)
+        set_redis(BrokenRedis())
+        await self.cache.get("other@test.com")
+        # Redis is marked down, yet the invalidation still tries it and is kept for later.
+        await self.cache.invalidate(self.user.email)
+        set_redis(self.redis)
+        self.assertIsNotNone(await self.redis.get("user:test@test.com"))
+        self.cache._redis_down_until = 0.0
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.assertIsNone(await self.redis.get("user:test@test.com"))
+
+    async def test_invalidate_tries_redis_during_backoff(self):
+        await self.fill(self.user)
+        self.cache._redis_down_until = float("inf")
+        await self.cache.invalidate(self.user.email)
+        self.assertIsNone(await self.redis.get("user:test@test.com"))
+
+    async def test_set_after_invalidate_is_skipped(self):
+        generation = await self.cache.generation(self.user.email)
+        # A write invalidates the user while the miss is still reading the database.
+        await self.cache.invalidate(self.user.email)
+        await self.cache.set(self.user, generation)
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.assertIsNone(await self.redis.get("user:test@test.com"))
+
+    async def test_set_after_invalidate_in_other_process_is_skipped(self):
+        other = UserCache(ttl=60, l1_ttl=60, l1_size=2)
+        generation = await self.cache.generation(self.user.email)
+        await other.invalidate(self.user.email)
+        await self.cache.set(self.user, generation)
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.assertIsNone(await self.redis.get("user:test@test.com"))
+
+    async def test_set_after_invalidate_while_redis_down_is_skipped(self):
+        set_redis(BrokenRedis())
+        generation = await self.cache.generation(self.user.email)
+        await self.cache.invalidate(self.user.email)
+        await self.cache.set(self.user, generation)
+        self.assertIsNone(self.cache._l1_get(self.user.email))